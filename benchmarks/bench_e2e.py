@@ -0,0 +1,407 @@
+"""End-to-end benchmark: crawl → download → parse → index → query, fully offline.
+
+A local HTTP server stands in for www.mospi.gov.in: paginated `/press-release`
+listing pages and generated PDFs under `/sites/default/files/press_release/`.
+Requests for the real host are routed to it by a transport adapter on the
+shared session, so the crawler's URL filter and pagination run unchanged.
+The embedder and LLM are deterministic stubs registered through
+`rag.resources.registry` (no Ollama needed), and everything is written to a
+throwaway working directory.
+
+Usage:
+    python benchmarks/bench_e2e.py [--pdfs 40] [--pages-per-pdf 6] [--per-page 20]
+        [--concurrency 4] [--queries 20] [--mode stages|pipeline] [--keep]
+
+`--mode stages` times each stage on its own with the library calls the
+pipeline uses; `--mode pipeline` times `discover` + `process_backlog` as
+one run. Prints one JSON object (throughputs, peak RSS of this process
+and, in stages mode, of the parse workers) to compare across commits.
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse, json, math, random, resource, shutil, subprocess, tempfile, threading, time, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+SITE = "https://www.mospi.gov.in"
+SEED = SITE + "/press-release"
+PDF_PATH = "/sites/default/files/press_release/"
+
+_WORDS = (
+    "index consumer price inflation rural urban combined provisional final estimate growth sector "
+    "manufacturing mining electricity production quarterly annual survey household employment rate "
+    "labour force participation weighted average base year revision month percent compared previous "
+    "ministry statistics release states union territories food beverages housing fuel clothing"
+).split()
+_MONTHS = "January February March April May June July August September October November December".split()
+
+
+# --- corpus ---------------------------------------------------------------
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: list[list[str]], table: list[list[str]] = None) -> bytes:
+    """Minimal text PDF (Helvetica, one content stream per page). `table`
+    is drawn as a ruled grid on the first page so table extraction has work.
+    """
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * len(pages) + 1
+    kids = []
+    for n, lines in enumerate(pages):
+        ops = ["BT /F1 10 Tf 50 750 Td 12 TL"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        if table and n == 0:
+            rows, cols = len(table), len(table[0])
+            top, height, width = 200, 18, 110
+            for i in range(rows + 1):
+                ops.append(f"50 {top - i * height} m {50 + cols * width} {top - i * height} l S")
+            for j in range(cols + 1):
+                ops.append(f"{50 + j * width} {top} m {50 + j * width} {top - rows * height} l S")
+            ops.append("BT /F1 9 Tf")
+            for i, row in enumerate(table):
+                for j, cell in enumerate(row):
+                    ops.append(f"1 0 0 1 {55 + j * width} {top - (i + 1) * height + 5} Tm ({_pdf_escape(cell)}) Tj")
+            ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+        ))
+    assert add(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) + b"] /Count %d >>" % len(kids)) == pages_id
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def build_corpus(n_pdfs: int, pages_per_pdf: int, seed: int = 0) -> list[dict]:
+    """Deterministic press releases: {name, title, date, pdf}."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n_pdfs):
+        month, year = _MONTHS[i % 12], 2015 + i // 12
+        title = f"Press Release on {rng.choice(['CPI', 'IIP', 'PLFS', 'GDP', 'WPI'])} for {month} {year} ({i})"
+        pages = []
+        for p in range(pages_per_pdf):
+            lines = [title if p == 0 else f"{title} - page {p + 1}"]
+            for _ in range(45):
+                words = rng.choices(_WORDS, k=12)
+                lines.append(" ".join(words) + f" {rng.uniform(0, 200):.2f} percent in {month} {year}.")
+            pages.append(lines)
+        table = [["Group", "Rural", "Urban"]] + [
+            [rng.choice(_WORDS).title(), f"{rng.uniform(90, 220):.1f}", f"{rng.uniform(90, 220):.1f}"] for _ in range(5)
+        ]
+        corpus.append({
+            "name": f"PR_bench_{i:05d}.pdf",
+            "title": title,
+            "date": f"{1 + i % 28:02d}-{1 + i % 12:02d}-{year}",
+            "pdf": make_pdf(pages, table),
+        })
+    return corpus
+
+
+def listing_page(corpus: list[dict], page: int, per_page: int) -> bytes:
+    """A listing page shaped like mospi.gov.in/press-release (table rows + pager)."""
+    rows = []
+    for n, doc in enumerate(corpus[page * per_page:(page + 1) * per_page], page * per_page + 1):
+        rows.append(
+            f'<tr class="views-row"><td class="views-field views-field-counter">{n}</td>'
+            f'<td class="views-field views-field-title"><span class="field-content">{doc["title"]}</span></td>'
+            f'<td class="views-field views-field-date"><span class="date-display-single">{doc["date"]}</span> '
+            f'<a href="{SITE}{PDF_PATH}{doc["name"]}" class="pdf-link" title="Download PDF">{doc["title"]}</a></td></tr>'
+        )
+    pager = ""
+    if (page + 1) * per_page < len(corpus):
+        pager = f'<li class="pager__item pager__item--next"><a href="?page={page + 1}" rel="next">Next ›</a></li>'
+    html = (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Press Release</title></head><body>'
+        '<nav class="main-menu"><a href="/">Home</a><a href="/about">About</a></nav>'
+        f'<table class="views-table"><tbody>{"".join(rows)}</tbody></table>'
+        f'<nav class="pager"><ul>{pager}</ul></nav></body></html>'
+    )
+    return html.encode("utf-8")
+
+
+# --- stand-in server ------------------------------------------------------
+
+def serve(corpus: list[dict], per_page: int) -> ThreadingHTTPServer:
+    pdfs = {doc["name"]: doc["pdf"] for doc in corpus}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == "/press-release":
+                page = int(parse_qs(parts.query).get("page", ["0"])[0])
+                self._send(200, "text/html; charset=utf-8", listing_page(corpus, page, per_page))
+            elif parts.path.startswith(PDF_PATH) and parts.path[len(PDF_PATH):] in pdfs:
+                self._send(200, "application/pdf", pdfs[parts.path[len(PDF_PATH):]])
+            else:
+                self._send(404, "text/plain", b"not found")
+
+        def _send(self, status: int, content_type: str, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return server
+
+
+def route_site_to(origin: str, pool_size: int):
+    """Send every request for SITE on the shared session to `origin` instead."""
+    from requests.adapters import HTTPAdapter
+    from scraper.http import get_session
+
+    class LocalAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            request.url = origin + request.url[len(SITE):]
+            return super().send(request, **kwargs)
+
+    get_session().mount(SITE, LocalAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+
+
+# --- stubs ----------------------------------------------------------------
+
+def register_stubs():
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.fake import FakeListLLM
+    from rag.config import EMBED_CACHE_PATH, EMBED_BATCH_SIZE
+    from rag.embeddings import CachedEmbeddings
+    from rag.resources import registry
+
+    class StubEmbeddings(Embeddings):
+        """Hashed bag-of-words vectors: deterministic, cheap, and similar texts stay close."""
+        dim = 64
+
+        def _embed(self, text: str) -> list[float]:
+            vec = [0.0] * self.dim
+            for tok in text.lower().split():
+                vec[zlib.crc32(tok.encode("utf-8")) % self.dim] += 1.0
+            norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+            return [x / norm for x in vec]
+
+        def embed_documents(self, texts):
+            return [self._embed(t) for t in texts]
+
+        def embed_query(self, text):
+            return self._embed(text)
+
+    registry.register("embeddings", lambda: CachedEmbeddings(StubEmbeddings(), model="bench-stub", cache_path=EMBED_CACHE_PATH, batch_size=EMBED_BATCH_SIZE))
+    registry.register("llm", lambda: FakeListLLM(responses=["Stub answer."]))
+
+
+# --- runs -----------------------------------------------------------------
+
+def _rate(n: float, seconds: float) -> float:
+    return round(n / seconds, 2) if seconds > 0 else 0.0
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def _extract_with_rss(path: str):
+    # Runs in a parse worker; forkserver workers are not our children, so
+    # RUSAGE_CHILDREN would not see them
+    from scraper.parse import extract_pdf
+    return extract_pdf(path), _max_rss_mb()
+
+
+def _chunk_count() -> int:
+    from rag.retriever import get_vs
+    return get_vs()._collection.count()
+
+
+def run_stages(concurrency: int) -> dict:
+    from scraper.crawl import scrape_listing_and_details, download_pdfs
+    from pipeline.run import _parse_pool
+    from rag.retriever import chunk_and_index, flush_index
+
+    pages = []
+    t = time.perf_counter()
+    docs = scrape_listing_and_details(SEED, on_page=pages.append)
+    crawl_s = time.perf_counter() - t
+    urls = [u for d in docs for u in d["file_links"]]
+
+    t = time.perf_counter()
+    results = list(download_pdfs(urls, concurrency=concurrency))
+    download_s = time.perf_counter() - t
+    paths = [path for _, path, _, err in results if err is None]
+    mb = sum(os.path.getsize(p) for p in paths) / 2**20
+
+    t = time.perf_counter()
+    with _parse_pool() as pool:
+        extractions, worker_rss = zip(*pool.map(_extract_with_rss, paths)) if paths else ((), ())
+    parse_s = time.perf_counter() - t
+    pdf_pages = sum(e.page_count for e in extractions)
+
+    t = time.perf_counter()
+    for path, extraction in zip(paths, extractions):
+        chunk_and_index(extraction.text, meta_source=path)
+    flush_index()
+    index_s = time.perf_counter() - t
+    chunks = _chunk_count()
+
+    return {
+        "listing_pages": len(pages),
+        "documents": len(docs),
+        "download_errors": len(results) - len(paths),
+        "corpus_mb": round(mb, 2),
+        "pdf_pages": pdf_pages,
+        "tables": sum(len(e.tables) for e in extractions),
+        "chunks": chunks,
+        "crawl_seconds": round(crawl_s, 3),
+        "download_seconds": round(download_s, 3),
+        "parse_seconds": round(parse_s, 3),
+        "index_seconds": round(index_s, 3),
+        "pages_per_second": _rate(len(pages), crawl_s),
+        "download_mb_per_second": _rate(mb, download_s),
+        "download_pdfs_per_second": _rate(len(paths), download_s),
+        "parse_pdfs_per_second": _rate(len(paths), parse_s),
+        "parse_pdf_pages_per_second": _rate(pdf_pages, parse_s),
+        "chunks_per_second": _rate(chunks, index_s),
+        "peak_parse_worker_rss_mb": round(max(worker_rss, default=0.0), 1),
+    }
+
+
+def run_pipeline_mode(concurrency: int) -> dict:
+    from collections import Counter
+    from pipeline.run import discover, process_backlog
+
+    counts, lock = Counter(), threading.Lock()
+
+    def progress(counter, n=1):
+        with lock:
+            counts[counter] += n
+
+    t = time.perf_counter()
+    documents = discover(SEED, progress=progress)
+    discover_s = time.perf_counter() - t
+    process_backlog(concurrency=concurrency, progress=progress)
+    total_s = time.perf_counter() - t
+    raw_dir = os.path.join("data", "raw")
+    mb = sum(e.stat().st_size for e in os.scandir(raw_dir)) / 2**20 if os.path.isdir(raw_dir) else 0.0
+    chunks = _chunk_count()
+    return {
+        "listing_pages": counts["pages_listed"],
+        "documents": documents,
+        "files_indexed": counts["files_indexed"],
+        "files_failed": counts["files_failed"],
+        "corpus_mb": round(mb, 2),
+        "chunks": chunks,
+        "discover_seconds": round(discover_s, 3),
+        "total_seconds": round(total_s, 3),
+        "pages_per_second": _rate(counts["pages_listed"], discover_s),
+        "mb_per_second": _rate(mb, total_s),
+        "pdfs_per_second": _rate(counts["files_indexed"], total_s),
+        "chunks_per_second": _rate(chunks, total_s),
+    }
+
+
+def run_queries(n: int) -> dict:
+    from rag.api import retrieve_and_answer
+    rng = random.Random(1)
+    t = time.perf_counter()
+    for _ in range(n):
+        retrieve_and_answer(f"What was the {' '.join(rng.choices(_WORDS, k=3))} in {rng.choice(_MONTHS)} {rng.randint(2015, 2020)}?")
+    query_s = time.perf_counter() - t
+    return {"queries": n, "query_seconds": round(query_s, 3), "queries_per_second": _rate(n, query_s)}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--pdfs", type=int, default=40, help="press releases in the corpus")
+    ap.add_argument("--pages-per-pdf", type=int, default=6)
+    ap.add_argument("--per-page", type=int, default=20, help="entries per listing page")
+    ap.add_argument("--concurrency", type=int, default=4, help="downloads in flight")
+    ap.add_argument("--queries", type=int, default=20, help="questions answered after indexing (0 skips)")
+    ap.add_argument("--mode", choices=["stages", "pipeline"], default="stages")
+    ap.add_argument("--keep", action="store_true", help="keep the working directory")
+    args = ap.parse_args()
+
+    commit = _git_commit()
+    workdir = tempfile.mkdtemp(prefix="mospi-bench-")
+    os.chdir(workdir)  # data/ (SQLite, Chroma, caches, PDFs) is relative to the CWD
+    listing_pages = max(1, math.ceil(args.pdfs / args.per_page))
+    os.environ["SCRAPER_MAX_PAGES_PER_SEED"] = str(listing_pages)
+    os.environ["SCRAPER_CONCURRENCY"] = str(args.concurrency)
+    # Measure the code, not politeness delays or warm caches (override to include them)
+    os.environ.setdefault("SCRAPER_RATE_LIMIT_SECONDS", "0")
+    os.environ.setdefault("SCRAPER_RESPECT_ROBOTS", "false")
+    os.environ.setdefault("SCRAPER_HTTP_CACHE_ENABLED", "false")
+    os.environ.setdefault("RAG_ANSWER_CACHE_ENABLED", "false")
+    # The logger writes to stdout too; keep it to errors so the summary stays parseable
+    os.environ.setdefault("LOG_LEVEL", "error")
+
+    try:
+        t = time.perf_counter()
+        corpus = build_corpus(args.pdfs, args.pages_per_pdf)
+        generate_s = time.perf_counter() - t
+        server = serve(corpus, args.per_page)
+        route_site_to(f"http://127.0.0.1:{server.server_port}", pool_size=max(args.concurrency, 10))
+        register_stubs()
+
+        result = run_stages(args.concurrency) if args.mode == "stages" else run_pipeline_mode(args.concurrency)
+        if args.queries:
+            result.update(run_queries(args.queries))
+        server.shutdown()
+        print(json.dumps({
+            "commit": commit,
+            "mode": args.mode,
+            "pdfs": args.pdfs,
+            "pages_per_pdf": args.pages_per_pdf,
+            "concurrency": args.concurrency,
+            "generate_seconds": round(generate_s, 3),
+            **result,
+            "peak_rss_mb": round(_max_rss_mb(), 1),
+        }))
+    finally:
+        os.chdir(os.path.dirname(workdir))
+        if args.keep:
+            print(f"working directory kept: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
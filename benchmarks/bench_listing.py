@@ -0,0 +1,86 @@
+"""Micro-benchmark: listing-page extraction, legacy two-pass parser vs `extract_listing`.
+
+Usage:
+    python benchmarks/bench_listing.py [--html benchmarks/fixtures/mospi_listing.html] [--repeat 200]
+
+Prints one JSON object with per-call timings (ms) and the speedup.
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse, json, re, time
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+
+from scraper.crawl import extract_listing, _HTML_PARSER
+
+PAGE_URL = "https://www.mospi.gov.in/press-release"
+DEFAULT_HTML = os.path.join(os.path.dirname(__file__), "fixtures", "mospi_listing.html")
+
+
+def legacy_extract(html: str, url: str):
+    """The pre-refactor logic of scrape_listing_and_details, kept as the baseline."""
+    soup = BeautifulSoup(html, "html.parser")
+    entries = []
+    for a in soup.find_all("a", href=True):
+        href = a["href"].strip()
+        if not href:
+            continue
+        if re.search(r"https://www\.mospi\.gov\.in/sites/default/files/press_release/.*\.pdf", href, re.IGNORECASE):
+            pdf_url = urljoin(url, href)
+            title = (a.get_text() or "").strip() or os.path.basename(pdf_url)
+            date_text = None
+            parent_text = (a.find_parent().get_text(" ", strip=True) if a.find_parent() else "")
+            m = re.search(r"(\d{1,2}[\-/ ](?:[A-Za-z]{3,9}|\d{1,2})[\-/ ]\d{4})", parent_text)
+            if m:
+                date_text = m.group(1)
+            entries.append((pdf_url, title, date_text))
+    next_link = None
+    for a in soup.find_all("a", href=True):
+        label = (a.get_text() or "").strip().lower()
+        if label in {"next", "next ›", "›", "older", ">>"}:
+            next_link = urljoin(url, a["href"].strip())
+            break
+    return entries, next_link
+
+
+def _time(fn, repeat: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--html", default=DEFAULT_HTML, help="saved listing page")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    with open(args.html, encoding="utf-8") as f:
+        html = f.read()
+
+    legacy = legacy_extract(html, PAGE_URL)
+    current = extract_listing(html, PAGE_URL)
+    if legacy != current:
+        raise SystemExit("extract_listing output differs from the legacy parser")
+
+    legacy_ms = _time(lambda: legacy_extract(html, PAGE_URL), args.repeat)
+    details_ms = _time(lambda: extract_listing(html, PAGE_URL), args.repeat)
+    links_ms = _time(lambda: extract_listing(html, PAGE_URL, with_dates=False), args.repeat)
+    print(json.dumps({
+        "html_bytes": len(html.encode("utf-8")),
+        "pdf_links": len(current[0]),
+        "parser": _HTML_PARSER,
+        "repeat": args.repeat,
+        "legacy_ms": round(legacy_ms, 3),
+        "extract_listing_ms": round(details_ms, 3),
+        "extract_links_only_ms": round(links_ms, 3),
+        "speedup": round(legacy_ms / details_ms, 2),
+        "speedup_links_only": round(legacy_ms / links_ms, 2),
+    }))
+
+
+if __name__ == "__main__":
+    main()
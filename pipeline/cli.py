@@ -0,0 +1,117 @@
+"""Headless batch crawl for cron jobs and containers (no Streamlit).
+
+Discovers every seed in parallel, then drains the whole unprocessed
+backlog and prints a JSON throughput summary. Exits 1 if any file failed.
+
+Usage:
+    python -m pipeline.cli SEED [SEED ...] [--seeds-file FILE]
+        [--concurrency N] [--limit N] [--ocr] [--dry-run]
+"""
+import argparse, json, sys, threading, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from scraper.config import CONCURRENCY
+from scraper.crawl import scrape_listing_and_details
+from scraper import logging as log
+from scraper import metrics
+from pipeline.run import discover, process_backlog
+
+
+class _Progress:
+    """Thread-safe tally of the pipeline's progress counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def __call__(self, counter: str, n: int = 1):
+        with self.lock:
+            self.counts[counter] += n
+
+
+def read_seeds(seeds: list[str], seeds_file: str = None) -> list[str]:
+    """Seeds from the command line plus one URL per line of `seeds_file`
+    ('#' starts a comment), de-duplicated in order.
+    """
+    urls = list(seeds)
+    if seeds_file:
+        with open(seeds_file, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    urls.append(line)
+    return list(dict.fromkeys(urls))
+
+
+def _dry_run(seed: str, progress: _Progress) -> int:
+    docs = scrape_listing_and_details(seed, on_page=lambda _: progress("pages_listed"))
+    progress("files_total", sum(len(d.get("file_links", [])) for d in docs))
+    return len(docs)
+
+
+def run(seeds: list[str], concurrency: int = CONCURRENCY, limit: int = None, use_ocr: bool = False, dry_run: bool = False) -> dict:
+    progress = _Progress()
+    started = time.monotonic()
+    documents = 0
+
+    # Seeds share the per-host token bucket, so parallel discovery stays polite
+    crawl = _dry_run if dry_run else discover
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(seeds))), thread_name_prefix="seed") as pool:
+        futures = {seed: pool.submit(crawl, seed, progress=progress) for seed in seeds}
+        for seed, fut in futures.items():
+            try:
+                documents += fut.result()
+            except Exception as e:
+                log.error("seed_discovery_failed", url=seed, error=str(e))
+                progress("seeds_failed")
+    discovered = time.monotonic()
+
+    if not dry_run:
+        process_backlog(limit=limit, use_ocr=use_ocr, concurrency=concurrency, progress=progress)
+    elapsed = time.monotonic() - started
+
+    counts = progress.counts
+    processing = max(elapsed - (discovered - started), 1e-9)
+    return {
+        "seeds": len(seeds),
+        "seeds_failed": counts["seeds_failed"],
+        "dry_run": dry_run,
+        "documents": documents,
+        "pages_listed": counts["pages_listed"],
+        "files_total": counts["files_total"],
+        "files_downloaded": counts["files_downloaded"],
+        "files_parsed": counts["files_parsed"],
+        "files_indexed": counts["files_indexed"],
+        "files_failed": counts["files_failed"],
+        "discovery_seconds": round(discovered - started, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(counts["pages_listed"] / max(discovered - started, 1e-9), 2),
+        "files_per_second": round((counts["files_indexed"] + counts["files_failed"]) / processing, 2),
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    ap = argparse.ArgumentParser(description="Crawl MoSPI seeds and process the whole unprocessed backlog.")
+    ap.add_argument("seeds", nargs="*", help="listing page URLs to crawl")
+    ap.add_argument("--seeds-file", help="file with one seed URL per line")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY, help="seeds crawled and PDFs downloaded in parallel (default: SCRAPER_CONCURRENCY)")
+    ap.add_argument("--limit", type=int, help="process at most this many files (default: the whole backlog)")
+    ap.add_argument("--ocr", action="store_true", help="OCR scanned PDFs")
+    ap.add_argument("--dry-run", action="store_true", help="only crawl listings and report what was found; no downloads or DB writes")
+    args = ap.parse_args(argv)
+    metrics.start_exporters()
+
+    seeds = read_seeds(args.seeds, args.seeds_file)
+    if not seeds:
+        # Nothing to crawl: just drain what earlier runs discovered
+        log.info("no_seeds", action="processing existing backlog")
+    summary = run(seeds, concurrency=max(1, args.concurrency), limit=args.limit, use_ocr=args.ocr, dry_run=args.dry_run)
+    # Log lines are written by a background thread; let them all out first so
+    # the summary is always the last line
+    log.flush()
+    print(json.dumps(summary))
+    return 1 if summary["files_failed"] or summary["seeds_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,75 +1,288 @@
-from scraper.crawl import scrape_pdf_links, download_pdf_to_disk, scrape_listing_and_details
-from scraper.parse import extract_text_from_pdf, extract_first_table
+from scraper.crawl import scrape_pdf_links, download_pdf_to_disk, download_pdfs, scrape_listing_and_details
+from scraper.parse import extract_pdf_to_file, iter_text_file
 from scraper.models import (
     init_db, upsert_file_url, get_unprocessed, update_after_download, mark_processed,
-    upsert_document, upsert_file_for_document, set_file_meta, insert_table, update_file_path,
+    upsert_document, upsert_file_for_document, set_file_meta, insert_table, delete_tables_for_file, update_file_path,
+    upsert_documents, upsert_files_for_documents, get_file_hash, find_processed_by_hash, link_duplicate_file, get_document_id_for_file, transaction,
 )
+from scraper.config import PIPELINE_PIPELINED, PIPELINE_PARSE_WORKERS, PIPELINE_QUEUE_SIZE
 from scraper import logging as log
-import os, shutil
-from rag.retriever import chunk_and_index
+from scraper import metrics
+import os, shutil, queue, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from rag.retriever import chunk_and_index, flush_index
 
-def run_pipeline(base_url: str, limit=2, use_ocr=False):
+_DONE = object()
+
+
+def _no_progress(counter: str, n: int = 1):
+    pass
+
+
+def run_pipeline(base_url: str, limit=2, use_ocr=False, pipelined: bool = None, progress=None):
+    """Discover, download, parse and index up to `limit` unprocessed files.
+
+    `progress(counter, n=1)` is called as work completes, with counter one of
+    pages_listed, files_total, files_downloaded (fetched or already on disk),
+    files_parsed, files_indexed (including linked duplicates) or files_failed.
+    It may be called from pipeline threads.
+    """
+    discover(base_url, limit=limit, progress=progress)
+    process_backlog(limit=limit, use_ocr=use_ocr, pipelined=pipelined, progress=progress)
+
+
+def discover(base_url: str, limit=None, progress=None) -> int:
+    """Crawl one seed's listing pages and upsert its documents and files
+    (at most `limit` file links per document). Returns the document count.
+    """
+    progress = progress or _no_progress
+    init_db()
+    docs = scrape_listing_and_details(base_url, on_page=lambda _: progress("pages_listed"))
+    log.info("discovered_docs", url=base_url, count=len(docs))
+    doc_ids = upsert_documents(docs)
+    upsert_files_for_documents([
+        (doc_ids[d["url"]], f_url)
+        for d in docs if d.get("url") in doc_ids
+        for f_url in d.get("file_links", [])[: limit]
+    ])
+    return len(docs)
+
+
+def process_backlog(limit=None, use_ocr=False, pipelined: bool = None, concurrency: int = None, progress=None) -> int:
+    """Download, parse and index the oldest `limit` unprocessed files
+    (`None`: the whole backlog), with up to `concurrency` downloads in flight.
+    Returns the number of files attempted.
+    """
+    progress = progress or _no_progress
     init_db()
-    # Discover documents + files
-    docs = scrape_listing_and_details(base_url)
-    log.info("discovered_docs", count=len(docs))
-    for d in docs:
-        doc_id = upsert_document(
-            url=d.get("url"),
-            title=d.get("title"),
-            date_published=d.get("date_published"),
-            summary=d.get("summary"),
-            category=d.get("category"),
-        )
-        for f_url in d.get("file_links", [])[: limit]:
-            file_id = upsert_file_for_document(doc_id, f_url)
-            upsert_file_url(f_url)
-
-    # Process unprocessed files
     rows = get_unprocessed(limit=limit)
+    progress("files_total", len(rows))
+    if PIPELINE_PIPELINED if pipelined is None else pipelined:
+        _process_pipelined(rows, use_ocr, progress, concurrency)
+    else:
+        _process_sequential(rows, use_ocr, progress, concurrency)
+    flush_index()
+    return len(rows)
+
+
+def _link_if_duplicate(file_id, file_url, file_hash) -> bool:
+    """If identical content was already processed, link to it instead of re-parsing and re-embedding."""
+    canonical_id = find_processed_by_hash(file_hash, exclude_file_id=file_id) if file_hash else None
+    if canonical_id is None:
+        return False
+    link_duplicate_file(file_id, canonical_id)
+    log.info("file_deduplicated", file_url=file_url, duplicate_of=canonical_id)
+    return True
+
+
+def _text_path(file_path: str) -> str:
+    # Extracted text goes to data/processed as .txt (the PDF remains in data/raw)
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join("data", "processed", base + ".txt")
+
+
+def _extract(file_path, use_ocr):
+    """Stream the PDF's text to its .txt page by page; only the tables and
+    page count come back in memory."""
+    return extract_pdf_to_file(file_path, _text_path(file_path), ocr=use_ocr)
+
+
+def _store_and_index(file_id, file_url, file_path, extraction, progress=_no_progress):
+    """Persist one file's extraction (meta, tables), index its .txt and mark it processed."""
+    def on_indexed():
+        # One unit of work per file, written only once its chunks are in the
+        # vector store: a failure leaves neither tables nor the processed flag
+        with metrics.timed("db_write", file_url=file_url), transaction():
+            set_file_meta(file_id, file_type="pdf", pages=extraction.page_count)
+            delete_tables_for_file(file_id)
+            doc_id = get_document_id_for_file(file_id) if extraction.tables else None
+            if doc_id:
+                for table in extraction.tables:
+                    insert_table(doc_id, file_id, table.rows, page_number=table.page_number, bbox=table.bbox)
+            mark_processed(file_id)
+        log.info("file_processed", file_url=file_url, file_path=file_path)
+        progress("files_indexed")
+
+    def on_failed(error):
+        # Same report as a failure raised while this file was being handled
+        log.error("file_process_failed", file_url=file_url, error=str(error))
+        progress("files_failed")
+
+    # Chunk the .txt as a stream of blocks; embedding is batched across
+    # files, so on_indexed/on_failed may run during a later file or flush_index()
+    chunk_and_index(
+        iter_text_file(extraction.text_path), meta_source=extraction.text_path, on_indexed=on_indexed, on_failed=on_failed
+    )
+
+
+def _process_sequential(rows, use_ocr, progress=_no_progress, concurrency=None):
+    # Fetch missing PDFs concurrently (SCRAPER_CONCURRENCY requests in flight)
+    ids_by_url = {file_url: file_id for file_id, file_url, _, downloaded, _ in rows if not downloaded}
+    download_errors = {}
+    for f_url, path, file_hash, err in download_pdfs(list(ids_by_url), concurrency=concurrency):
+        if err is not None:
+            download_errors[f_url] = err
+            continue
+        update_after_download(ids_by_url[f_url], path, file_hash)
+        progress("files_downloaded")
+    progress("files_downloaded", len(rows) - len(ids_by_url))
+    rows = get_unprocessed(limit=len(rows))
+
+    seen_hashes = set()
     for file_id, file_url, file_path, downloaded, processed in rows:
         try:
+            if file_url in download_errors:
+                raise download_errors[file_url]
             if not downloaded:
                 path, file_hash = download_pdf_to_disk(file_url)
                 update_after_download(file_id, path, file_hash)
+                progress("files_downloaded")
                 file_path = path
-            text = extract_text_from_pdf(file_path, ocr=use_ocr)
-            # set metadata: pages
-            try:
-                import pdfplumber
-                with pdfplumber.open(file_path) as pdf:
-                    set_file_meta(file_id, file_type="pdf", pages=len(pdf.pages))
-            except Exception:
-                set_file_meta(file_id, file_type="pdf", pages=None)
-            # table extraction
-            table = extract_first_table(file_path)
-            if table:
-                # We do not have document_id in this row; fetch it
-                # Simple query: get doc_id via helper
-                from sqlite3 import connect
-                conn = connect("data/mospi.db")
-                cur = conn.cursor()
-                cur.execute("SELECT document_id FROM files WHERE id=?", (file_id,))
-                row = cur.fetchone()
-                doc_id = row[0] if row else None
-                conn.close()
-                if doc_id:
-                    insert_table(doc_id, file_id, table)
-            # Save extracted text to data/processed as .txt (PDF remains in data/raw)
+            file_hash = get_file_hash(file_id)
+            if file_hash in seen_hashes:
+                # The earlier copy may still be waiting in the index buffer
+                flush_index()
+            if _link_if_duplicate(file_id, file_url, file_hash):
+                progress("files_indexed")
+                continue
+            seen_hashes.add(file_hash)
+            extraction = _extract(file_path, use_ocr)
+            progress("files_parsed")
+            _store_and_index(file_id, file_url, file_path, extraction, progress)
+        except Exception as e:
+            log.error("file_process_failed", file_url=file_url, error=str(e))
+            progress("files_failed")
+
+
+def _extract_in_worker(file_path, use_ocr):
+    """Parse in a pool process and hand its metric samples back with the result."""
+    extraction = _extract(file_path, use_ocr)
+    # Pool processes end with os._exit, which skips the logger's atexit flush
+    log.flush()
+    return extraction, metrics.drain()
+
+
+def _parse_pool() -> ProcessPoolExecutor:
+    # forkserver avoids forking a process that already runs download/UI threads
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+    return ProcessPoolExecutor(max_workers=PIPELINE_PARSE_WORKERS, mp_context=ctx)
+
+
+def _process_pipelined(rows, use_ocr, progress=_no_progress, concurrency=None):
+    """Run download → parse → index as concurrent stages.
+
+    Downloads run on the SCRAPER_CONCURRENCY thread pool, pdfplumber parsing on
+    a PIPELINE_PARSE_WORKERS process pool, and storing/indexing on the calling
+    thread. Up to PIPELINE_PARSE_WORKERS + PIPELINE_QUEUE_SIZE files are
+    parsing or parsed-and-waiting at once, so every worker stays busy while
+    the indexer lags by at most PIPELINE_QUEUE_SIZE results; parsed files are
+    indexed in completion order. Parse workers stream text to data/processed
+    and return only tables and page counts, so no document's text is held
+    whole. A failing file is logged and left unprocessed.
+
+    Files whose content hash is already processed are linked instead of
+    parsed; copies of a file that is itself still in flight are linked once
+    the whole run has drained.
+    """
+    parse_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    # Completed parses only; its size is bounded by `slots`
+    index_q = queue.Queue()
+    # Files submitted to the pool and not yet indexed
+    slots = threading.Semaphore(PIPELINE_PARSE_WORKERS + PIPELINE_QUEUE_SIZE)
+    outstanding = [0]  # submitted futures whose result is not yet in index_q
+    delivered = threading.Condition()
+    in_flight = {}  # content hash -> file_id being parsed in this run
+    deferred = []  # (file_id, file_url, file_hash) waiting on an in-flight copy
+
+    def enqueue(file_id, file_url, file_path, file_hash):
+        if _link_if_duplicate(file_id, file_url, file_hash):
+            progress("files_indexed")
+            return
+        if file_hash and file_hash in in_flight:
+            deferred.append((file_id, file_url, file_hash))
+            return
+        if file_hash:
+            in_flight[file_hash] = file_id
+        parse_q.put((file_id, file_url, file_path))
+
+    def download_stage():
+        try:
+            pending = {}
+            for file_id, file_url, file_path, downloaded, _ in rows:
+                if downloaded:
+                    progress("files_downloaded")
+                    enqueue(file_id, file_url, file_path, get_file_hash(file_id))
+                else:
+                    pending[file_url] = file_id
+            for file_url, path, file_hash, err in download_pdfs(list(pending), concurrency=concurrency):
+                if err is not None:
+                    log.error("file_process_failed", file_url=file_url, error=str(err))
+                    progress("files_failed")
+                    continue
+                update_after_download(pending[file_url], path, file_hash)
+                progress("files_downloaded")
+                enqueue(pending[file_url], file_url, path, file_hash)
+        except Exception as e:
+            log.error("download_stage_failed", error=str(e))
+        finally:
+            parse_q.put(_DONE)
+
+    def deliver(item, future):
+        # Runs in the pool's callback thread as each parse finishes
+        index_q.put((*item, future))
+        with delivered:
+            outstanding[0] -= 1
+            delivered.notify_all()
+
+    def parse_stage(pool):
+        try:
+            while (item := parse_q.get()) is not _DONE:
+                slots.acquire()
+                try:
+                    future = pool.submit(_extract_in_worker, item[2], use_ocr)
+                except BaseException:
+                    slots.release()
+                    raise
+                with delivered:
+                    outstanding[0] += 1
+                future.add_done_callback(lambda f, item=item: deliver(item, f))
+        except Exception as e:
+            log.error("parse_stage_failed", error=str(e))
+            # Keep draining so the download stage is never blocked on a full queue
+            while parse_q.get() is not _DONE:
+                pass
+        finally:
+            with delivered:
+                delivered.wait_for(lambda: outstanding[0] == 0)
+            index_q.put(_DONE)
+
+    with _parse_pool() as pool:
+        stages = [
+            threading.Thread(target=download_stage, name="pipeline-download", daemon=True),
+            threading.Thread(target=parse_stage, args=(pool,), name="pipeline-parse", daemon=True),
+        ]
+        for t in stages:
+            t.start()
+        while (item := index_q.get()) is not _DONE:
+            file_id, file_url, file_path, future = item
             try:
-                processed_dir = os.path.join("data", "processed")
-                os.makedirs(processed_dir, exist_ok=True)
-                base = os.path.splitext(os.path.basename(file_path))[0]
-                txt_path = os.path.join(processed_dir, base + ".txt")
-                with open(txt_path, "w", encoding="utf-8") as f:
-                    f.write(text)
+                extraction, samples = future.result()
+                metrics.merge(samples)
+                progress("files_parsed")
+                _store_and_index(file_id, file_url, file_path, extraction, progress)
             except Exception as e:
-                log.error("write_text_failed", file_path=file_path, error=str(e))
-                txt_path = file_path
+                log.error("file_process_failed", file_url=file_url, error=str(e))
+                progress("files_failed")
+            finally:
+                slots.release()
+        for t in stages:
+            t.join()
 
-            # index text (use txt path as source if available)
-            chunk_and_index(text, meta_source=txt_path)
-            mark_processed(file_id)
-            log.info("file_processed", file_url=file_url, file_path=file_path)
-        except Exception as e:
-            log.error("file_process_failed", file_url=file_url, error=str(e))
+    if deferred:
+        flush_index()
+    for file_id, file_url, file_hash in deferred:
+        if _link_if_duplicate(file_id, file_url, file_hash):
+            progress("files_indexed")
+        else:
+            log.warn("file_dedup_pending", file_url=file_url, reason="original copy failed; retried next run")
@@ -0,0 +1,101 @@
+"""Background worker that executes queued pipeline jobs.
+
+The UI enqueues jobs into the `jobs` table (`enqueue_job`); this process
+claims them one at a time, runs them, and records progress counters and a
+heartbeat on the job row. Runs therefore survive browser refreshes, and the
+UI only polls. Jobs left 'running' by a worker that died (no heartbeat for
+WORKER_STALE_SECONDS) are put back in the queue.
+
+Usage:
+    python -m pipeline.worker [--once]
+"""
+import argparse, threading, time
+from scraper.config import WORKER_POLL_SECONDS, WORKER_HEARTBEAT_SECONDS, WORKER_STALE_SECONDS
+from scraper.models import init_db, claim_next_job, increment_job_counters, finish_job, requeue_stale_jobs
+from scraper import logging as log
+from scraper import metrics
+from pipeline.run import run_pipeline
+
+
+def _job_progress(job_id: int):
+    def progress(counter: str, n: int = 1):
+        # Progress is best effort: a busy database must never fail the run
+        try:
+            increment_job_counters(job_id, **{counter: n})
+        except Exception as e:
+            log.warn("job_progress_failed", job_id=job_id, counter=counter, error=str(e))
+    return progress
+
+
+def _run_pipeline_job(job_id: int, params: dict):
+    run_pipeline(
+        params["url"],
+        limit=params.get("limit", 2),
+        use_ocr=params.get("use_ocr", False),
+        progress=_job_progress(job_id),
+    )
+
+
+JOB_KINDS = {"pipeline": _run_pipeline_job}
+
+
+def _heartbeat(job_id: int, stop: threading.Event):
+    while not stop.wait(WORKER_HEARTBEAT_SECONDS):
+        try:
+            increment_job_counters(job_id)
+        except Exception as e:
+            log.warn("job_heartbeat_failed", job_id=job_id, error=str(e))
+
+
+def run_job(job_id: int, kind: str, params: dict) -> bool:
+    log.info("job_started", job_id=job_id, kind=kind, params=params)
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job_id, stop), name="job-heartbeat", daemon=True)
+    beat.start()
+    try:
+        handler = JOB_KINDS.get(kind)
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {kind}")
+        handler(job_id, params)
+    except Exception as e:
+        log.error("job_failed", job_id=job_id, kind=kind, error=str(e))
+        finish_job(job_id, "failed", error=str(e))
+        return False
+    finally:
+        stop.set()
+        beat.join()
+    finish_job(job_id, "succeeded")
+    log.info("job_succeeded", job_id=job_id, kind=kind)
+    return True
+
+
+def work(once: bool = False):
+    """Claim and run jobs until interrupted (or, with `once`, until the queue is empty)."""
+    init_db()
+    log.info("worker_started", poll_seconds=WORKER_POLL_SECONDS)
+    while True:
+        requeued = requeue_stale_jobs(WORKER_STALE_SECONDS)
+        if requeued:
+            log.warn("jobs_requeued", count=requeued, reason="no heartbeat")
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            time.sleep(WORKER_POLL_SECONDS)
+            continue
+        run_job(*job)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run queued pipeline jobs.")
+    ap.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    args = ap.parse_args()
+    metrics.start_exporters()
+    try:
+        work(once=args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os, re, math, time, sqlite3, threading
+from array import array
+from contextlib import contextmanager
+
+_PUNCT_RE = re.compile(r"[^\w\s.%/-]+")
+
+
+def normalize_question(question: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive cache key."""
+    q = _PUNCT_RE.sub(" ", question.lower())
+    return " ".join(q.split()).strip(" .")
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """Persistent question -> answer cache with TTL, LRU eviction and corpus-
+    version invalidation. Entries written against another corpus version
+    (i.e. before the index last changed) are never served and get purged.
+    With `similarity` > 0, a question whose embedding is at least that close
+    to a cached one also counts as a hit.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, similarity: float = 0.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    question TEXT,
+                    answer TEXT,
+                    embedding BLOB,
+                    corpus_version TEXT,
+                    created_at REAL,
+                    last_access REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, question: str, corpus_version: str, embedding: list[float] = None) -> str | None:
+        now = time.time()
+        key = normalize_question(question)
+        with self._lock, self._connect() as conn:
+            # Stale by corpus or age: drop so they neither match nor take space
+            conn.execute(
+                "DELETE FROM answers WHERE corpus_version<>? OR created_at<?",
+                (corpus_version, now - self.ttl_seconds),
+            )
+            row = conn.execute("SELECT key, answer FROM answers WHERE key=?", (key,)).fetchone()
+            if row is None and embedding is not None and self.similarity > 0:
+                best, best_sim = None, self.similarity
+                for k, answer, blob in conn.execute(
+                    "SELECT key, answer, embedding FROM answers WHERE embedding IS NOT NULL"
+                ):
+                    sim = _cosine(embedding, array("f", blob))
+                    if sim >= best_sim:
+                        best, best_sim = (k, answer), sim
+                row = best
+            if row is None:
+                return None
+            conn.execute("UPDATE answers SET last_access=? WHERE key=?", (now, row[0]))
+            return row[1]
+
+    def put(self, question: str, answer: str, corpus_version: str, embedding: list[float] = None):
+        now = time.time()
+        blob = array("f", embedding).tobytes() if embedding is not None else None
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO answers (key, question, answer, embedding, corpus_version, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (normalize_question(question), question, answer, blob, corpus_version, now, now),
+            )
+            conn.execute(
+                """
+                DELETE FROM answers WHERE key IN (
+                    SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM answers")
+
+
+def get_answer_cache() -> AnswerCache:
+    from .resources import registry
+    return registry.get("answer_cache")
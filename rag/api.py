@@ -1,19 +1,65 @@
-import streamlit as st
+import time
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama.llms import OllamaLLM
-from .retriever import get_vs
+from scraper import metrics
+from .retriever import hybrid_search, corpus_version
+from .resources import get_embeddings, get_llm
+from .answer_cache import get_answer_cache
+from .config import ANSWER_CACHE_ENABLED, ANSWER_CACHE_SIMILARITY
 from .prompt import PROMPT_TMPL
 
-def get_llm():
-    if "llm" not in st.session_state:
-        st.session_state.llm = OllamaLLM(model="llama3.1:8b")
-    return st.session_state.llm
+NO_INDEX_MESSAGE = "No indexed text yet. Please process some PDFs first."
 
-def retrieve_and_answer(question: str) -> str:
-    vs = get_vs()
-    retrieved = vs.similarity_search(question, k=10)
+def _prepare(question: str):
+    """Shared front half of answering: returns (cached_answer, context, finish),
+    where `finish(answer)` stores a freshly generated answer in the cache.
+    """
+    # Answers are cached per corpus version, so re-indexing invalidates them
+    version = corpus_version()
+    q_vec = get_embeddings().embed_query(question) if ANSWER_CACHE_ENABLED and ANSWER_CACHE_SIMILARITY > 0 else None
+    if ANSWER_CACHE_ENABLED:
+        with metrics.timed("answer_cache_lookup"):
+            cached = get_answer_cache().get(question, version, embedding=q_vec)
+        if cached is not None:
+            metrics.inc("answer_cache_hits_total")
+            return cached, None, None
+        metrics.inc("answer_cache_misses_total")
+
+    def finish(answer: str):
+        if ANSWER_CACHE_ENABLED:
+            get_answer_cache().put(question, answer, version, embedding=q_vec)
+
+    with metrics.timed("retrieve", question=question):
+        retrieved = hybrid_search(question)
     if not retrieved:
-        return "No indexed text yet. Please process some PDFs first."
-    context = "\n\n".join(doc.page_content for doc in retrieved)
-    prompt = ChatPromptTemplate.from_template(PROMPT_TMPL)
-    return (prompt | get_llm()).invoke({"question": question, "context": context})
+        return NO_INDEX_MESSAGE, None, None
+    return None, "\n\n".join(doc.page_content for doc in retrieved), finish
+
+def _chain():
+    return ChatPromptTemplate.from_template(PROMPT_TMPL) | get_llm()
+
+def retrieve_and_answer(question: str) -> str:
+    cached, context, finish = _prepare(question)
+    if cached is not None:
+        return cached
+    with metrics.timed("llm", question=question):
+        answer = _chain().invoke({"question": question, "context": context})
+    finish(answer)
+    return answer
+
+def stream_answer(question: str):
+    """Like `retrieve_and_answer`, but yields the answer as the LLM produces
+    tokens. Only a fully streamed answer is written to the answer cache.
+    """
+    cached, context, finish = _prepare(question)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    start = time.perf_counter()
+    with metrics.timed("llm", question=question):
+        for token in _chain().stream({"question": question, "context": context}):
+            if not parts:
+                metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_first_token")
+            parts.append(token)
+            yield token
+    finish("".join(parts))
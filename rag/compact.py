@@ -0,0 +1,66 @@
+"""One-shot compaction of the Chroma collection.
+
+Chunks written before ids became deterministic carry random ids, so every
+re-index appended another copy. This pass gives each (source, text) pair
+its `chunk_id`, reusing the stored embedding (nothing is re-embedded), and
+deletes every other copy.
+
+Usage:
+    python -m rag.compact [--dry-run]
+"""
+import argparse, json
+from rag.retriever import get_vs, chunk_id
+from scraper import logging as log
+
+
+def compact(dry_run: bool = False, page_size: int = 500) -> dict:
+    collection = get_vs()._collection
+    total = collection.count()
+    keep = set()  # canonical ids already present or scheduled
+    rekey = {}  # canonical id -> id of the legacy copy that will carry it
+    delete = []
+
+    # First pass: only read, so paging offsets stay valid
+    for offset in range(0, total, page_size):
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        for cid, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+            canonical = chunk_id((meta or {}).get("source", ""), doc or "")
+            if cid == canonical:
+                keep.add(cid)
+                rekey.pop(cid, None)  # the canonical copy exists after all
+            elif canonical in keep or canonical in rekey:
+                delete.append(cid)
+            else:
+                rekey[canonical] = cid
+                delete.append(cid)
+
+    stats = {"scanned": total, "rekeyed": len(rekey), "deleted": len(delete) - len(rekey)}
+    if dry_run:
+        return stats
+
+    old_ids = list(rekey.values())
+    for start in range(0, len(old_ids), page_size):
+        batch_old = old_ids[start:start + page_size]
+        got = collection.get(ids=batch_old, include=["documents", "metadatas", "embeddings"])
+        new_ids = [chunk_id((m or {}).get("source", ""), d or "") for d, m in zip(got["documents"], got["metadatas"])]
+        collection.upsert(
+            ids=new_ids,
+            embeddings=got["embeddings"],
+            documents=got["documents"],
+            metadatas=got["metadatas"],
+        )
+    for start in range(0, len(delete), page_size):
+        collection.delete(ids=delete[start:start + page_size])
+    log.info("vector_store_compacted", **stats)
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Remove duplicate chunks from the Chroma collection.")
+    ap.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = ap.parse_args()
+    print(json.dumps(compact(dry_run=args.dry_run)))
+
+
+if __name__ == "__main__":
+    main()
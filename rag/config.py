@@ -0,0 +1,29 @@
+import os
+from scraper.config import get_bool, get_int, get_float
+
+
+EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "llama3.1:8b")
+LLM_MODEL = os.getenv("RAG_LLM_MODEL", "llama3.1:8b")
+CHROMA_DIR = os.getenv("RAG_CHROMA_DIR", "data/chroma_db")
+COLLECTION_NAME = os.getenv("RAG_COLLECTION_NAME", "rag_collection")
+
+# Embedding / indexing
+EMBED_BATCH_SIZE = max(1, get_int("RAG_EMBED_BATCH_SIZE", 32))
+EMBED_CACHE_PATH = os.getenv("RAG_EMBED_CACHE_PATH", "data/embedding_cache.db")
+INDEX_FLUSH_CHUNKS = max(1, get_int("RAG_INDEX_FLUSH_CHUNKS", 128))
+INDEX_FLUSH_SECONDS = get_float("RAG_INDEX_FLUSH_SECONDS", 30.0)
+
+# Retrieval
+LEXICAL_INDEX_PATH = os.getenv("RAG_LEXICAL_INDEX_PATH", "data/lexical_index.db")
+TOP_K = max(1, get_int("RAG_TOP_K", 6))
+DENSE_K = max(1, get_int("RAG_DENSE_K", 10))
+LEXICAL_K = max(0, get_int("RAG_LEXICAL_K", 10))
+RRF_K = get_int("RAG_RRF_K", 60)
+
+# Answer cache
+ANSWER_CACHE_ENABLED = get_bool("RAG_ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_PATH = os.getenv("RAG_ANSWER_CACHE_PATH", "data/answer_cache.db")
+ANSWER_CACHE_TTL_SECONDS = get_float("RAG_ANSWER_CACHE_TTL_SECONDS", 24 * 3600)
+ANSWER_CACHE_MAX_ENTRIES = max(1, get_int("RAG_ANSWER_CACHE_MAX_ENTRIES", 1000))
+# Cosine similarity above which a differently worded question reuses an answer; 0 disables
+ANSWER_CACHE_SIMILARITY = get_float("RAG_ANSWER_CACHE_SIMILARITY", 0.0)
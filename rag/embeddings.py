@@ -0,0 +1,80 @@
+import os, hashlib, sqlite3, threading, json
+from array import array
+from contextlib import contextmanager
+from langchain_core.embeddings import Embeddings
+from scraper import metrics
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an embedder with a persistent vector cache and request batching.
+
+    Vectors are stored in SQLite as float32 blobs keyed by sha256(model, kind,
+    text), so unchanged chunks are never sent to the model twice, across
+    files and across runs. Cache misses are embedded `batch_size` at a time.
+    """
+
+    def __init__(self, inner: Embeddings, model: str, cache_path: str, batch_size: int = 32):
+        self.inner = inner
+        self.model = model
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.cache_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, vector FROM embeddings WHERE key IN (SELECT value FROM json_each(?))",
+                (json.dumps(keys),),
+            ).fetchall()
+        return {k: array("f", blob).tolist() for k, blob in rows}
+
+    def _store(self, items: list[tuple[str, list[float]]]):
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(k, array("f", v).tobytes()) for k, v in items],
+            )
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key("doc", t) for t in texts]
+        cached = self._lookup(list(dict.fromkeys(keys)))
+        # Embed each distinct missing text once, in batches
+        missing = list(dict.fromkeys((k, t) for k, t in zip(keys, texts) if k not in cached))
+        metrics.inc("embedding_cache_hits_total", len(keys) - len(missing))
+        metrics.inc("embedding_cache_misses_total", len(missing))
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            with metrics.timed("embed", texts=len(batch)):
+                vectors = self.inner.embed_documents([t for _, t in batch])
+            new = [(k, v) for (k, _), v in zip(batch, vectors)]
+            self._store(new)
+            cached.update(new)
+        return [cached[k] for k in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key("query", text)
+        hit = self._lookup([key]).get(key)
+        if hit is not None:
+            metrics.inc("embedding_cache_hits_total")
+            return hit
+        metrics.inc("embedding_cache_misses_total")
+        with metrics.timed("embed_query"):
+            vector = self.inner.embed_query(text)
+        self._store([(key, vector)])
+        return vector
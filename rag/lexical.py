@@ -0,0 +1,192 @@
+"""BM25 inverted index over indexed chunks, stored in SQLite.
+
+Dense embeddings are weak on exact figures, survey names and month/year
+strings ("CPI June 2025"); this index answers those lookups directly and
+is fused with vector hits in `retriever.hybrid_search`. It is maintained
+incrementally by `flush_index` under the same chunk ids as the vector store.
+
+Rebuild from the processed text files:
+    python -m rag.lexical --rebuild
+"""
+import os, re, math, json, glob, sqlite3, threading
+from collections import Counter
+from contextlib import contextmanager
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were what which who with".split()
+)
+_MONTHS = {
+    "jan": "january", "feb": "february", "mar": "march", "apr": "april", "jun": "june", "jul": "july",
+    "aug": "august", "sep": "september", "sept": "september", "oct": "october", "nov": "november", "dec": "december",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok in _STOPWORDS:
+            continue
+        tokens.append(_MONTHS.get(tok, tok))
+    return tokens
+
+
+class LexicalIndex:
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, source TEXT, content TEXT, length INTEGER)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT, chunk_id TEXT, tf INTEGER,
+                    PRIMARY KEY (term, chunk_id)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk_id ON postings(chunk_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source)")
+            # Chunk count and total length for BM25, kept current by add/delete:
+            # aggregating `chunks` per search would read every chunk's text
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), n_docs INTEGER, total_length INTEGER)"
+            )
+            if conn.execute("SELECT 1 FROM stats").fetchone() is None:
+                # Index written before the stats table existed: count it once
+                conn.execute("INSERT INTO stats SELECT 0, COUNT(*), COALESCE(SUM(length), 0) FROM chunks")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _uncount(conn, ids: str):
+        """Take the chunks in `ids` (a JSON list) that are stored out of the stats."""
+        conn.execute(
+            """
+            UPDATE stats SET (n_docs, total_length) = (
+                SELECT n_docs - COUNT(*), total_length - COALESCE(SUM(length), 0)
+                FROM chunks WHERE id IN (SELECT value FROM json_each(?))
+            )
+            """,
+            (ids,),
+        )
+
+    def add(self, items: list[tuple[str, str, str]]):
+        """Index (chunk_id, source, content) triples; re-adding an id replaces it."""
+        if not items:
+            return
+        with self._lock, self._connect() as conn:
+            # Last occurrence wins, as with INSERT OR REPLACE
+            items = list({cid: (cid, source, content) for cid, source, content in items}.values())
+            ids = json.dumps([cid for cid, _, _ in items])
+            conn.execute("DELETE FROM postings WHERE chunk_id IN (SELECT value FROM json_each(?))", (ids,))
+            self._uncount(conn, ids)
+            chunk_rows, posting_rows = [], []
+            for cid, source, content in items:
+                tf = Counter(tokenize(content))
+                chunk_rows.append((cid, source, content, sum(tf.values())))
+                posting_rows.extend((term, cid, n) for term, n in tf.items())
+            conn.executemany("INSERT OR REPLACE INTO chunks (id, source, content, length) VALUES (?, ?, ?, ?)", chunk_rows)
+            conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            conn.execute(
+                "UPDATE stats SET n_docs = n_docs + ?, total_length = total_length + ?",
+                (len(chunk_rows), sum(row[3] for row in chunk_rows)),
+            )
+
+    def delete(self, chunk_ids: list[str]):
+        if not chunk_ids:
+            return
+        ids = json.dumps(list(chunk_ids))
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM postings WHERE chunk_id IN (SELECT value FROM json_each(?))", (ids,))
+            self._uncount(conn, ids)
+            conn.execute("DELETE FROM chunks WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM chunks")
+            conn.execute("UPDATE stats SET n_docs = 0, total_length = 0")
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, str, str, float]]:
+        """Top-k (chunk_id, source, content, score) by BM25."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or k <= 0:
+            return []
+        with self._lock, self._connect() as conn:
+            n_docs, total_length = conn.execute("SELECT n_docs, total_length FROM stats").fetchone()
+            if not n_docs:
+                return []
+            avgdl = total_length / n_docs
+            dfs = conn.execute(
+                "SELECT term, COUNT(*) FROM postings WHERE term IN (SELECT value FROM json_each(?)) GROUP BY term",
+                (json.dumps(terms),),
+            ).fetchall()
+            if not dfs:
+                return []
+            idf = {t: math.log((n_docs - df + 0.5) / (df + 0.5) + 1.0) for t, df in dfs}
+            rows = conn.execute(
+                """
+                WITH w(term, idf) AS (SELECT key, value FROM json_each(:weights))
+                SELECT c.id, c.source, c.content,
+                       SUM(w.idf * p.tf * (:k1 + 1) / (p.tf + :k1 * (1 - :b + :b * c.length / :avgdl))) AS score
+                FROM w
+                JOIN postings p ON p.term = w.term
+                JOIN chunks c ON c.id = p.chunk_id
+                GROUP BY c.id
+                ORDER BY score DESC
+                LIMIT :k
+                """,
+                {"weights": json.dumps(idf), "k1": self.K1, "b": self.B, "avgdl": avgdl or 1.0, "k": k},
+            ).fetchall()
+        return [(cid, source, content, score) for cid, source, content, score in rows]
+
+
+def get_lexical_index() -> LexicalIndex:
+    from .resources import registry
+    return registry.get("lexical_index")
+
+
+def rebuild(processed_dir: str = os.path.join("data", "processed")) -> int:
+    """Re-create the index from data/processed/*.txt with the retriever's chunking."""
+    from rag.retriever import _split
+    index = get_lexical_index()
+    index.clear()
+    n = 0
+    for txt_path in sorted(glob.glob(os.path.join(processed_dir, "*.txt"))):
+        with open(txt_path, encoding="utf-8") as f:
+            chunks = _split(f.read(), txt_path)
+        index.add([(cid, txt_path, doc.page_content) for cid, doc in chunks.items()])
+        n += len(chunks)
+    return n
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Maintain the BM25 lexical index.")
+    ap.add_argument("--rebuild", action="store_true", help="rebuild from data/processed/*.txt")
+    ap.add_argument("--query", help="print the top BM25 hits for a query")
+    args = ap.parse_args()
+    if args.rebuild:
+        print(json.dumps({"chunks_indexed": rebuild()}))
+    if args.query:
+        for cid, source, content, score in get_lexical_index().search(args.query):
+            print(json.dumps({"score": round(score, 3), "source": source, "id": cid, "text": content[:120]}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Process-wide registry of heavyweight RAG resources.
+
+The embedder, Chroma client, LLM, lexical index and answer cache are each
+built once per process, lazily and thread-safely, and shared by the
+Streamlit UI (all sessions), the pipeline and any other service. Call
+`warm_up()` at startup to pay the construction cost before the first
+request; `registry.register(name, factory)` swaps a factory (e.g. a stub
+embedder in benchmarks) and drops any instance built from the old one.
+"""
+import threading
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"Unknown resource: {name}")
+            lock = self._locks[name]
+        # Build under a per-resource lock so a slow Chroma open never blocks the LLM
+        with lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._factories[name]()
+                self._instances[name] = instance
+            return instance
+
+    def reset(self, name: str = None):
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+registry = ResourceRegistry()
+
+
+def _build_embeddings():
+    from langchain_ollama import OllamaEmbeddings
+    from .config import EMBED_MODEL, EMBED_CACHE_PATH, EMBED_BATCH_SIZE
+    from .embeddings import CachedEmbeddings
+    return CachedEmbeddings(
+        OllamaEmbeddings(model=EMBED_MODEL),
+        model=EMBED_MODEL,
+        cache_path=EMBED_CACHE_PATH,
+        batch_size=EMBED_BATCH_SIZE,
+    )
+
+
+def _build_vector_store():
+    from langchain_community.vectorstores import Chroma
+    from .config import CHROMA_DIR, COLLECTION_NAME
+    return Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=registry.get("embeddings"),
+        persist_directory=CHROMA_DIR,  # folder where vectors will be saved
+    )
+
+
+def _build_llm():
+    from langchain_ollama.llms import OllamaLLM
+    from .config import LLM_MODEL
+    return OllamaLLM(model=LLM_MODEL)
+
+
+def _build_lexical_index():
+    from .config import LEXICAL_INDEX_PATH
+    from .lexical import LexicalIndex
+    return LexicalIndex(LEXICAL_INDEX_PATH)
+
+
+def _build_answer_cache():
+    from .config import ANSWER_CACHE_PATH, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY
+    from .answer_cache import AnswerCache
+    return AnswerCache(ANSWER_CACHE_PATH, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY)
+
+
+registry.register("embeddings", _build_embeddings)
+registry.register("vector_store", _build_vector_store)
+registry.register("llm", _build_llm)
+registry.register("lexical_index", _build_lexical_index)
+registry.register("answer_cache", _build_answer_cache)
+
+
+def get_embeddings():
+    return registry.get("embeddings")
+
+
+def get_vector_store():
+    return registry.get("vector_store")
+
+
+def get_llm():
+    return registry.get("llm")
+
+
+def warm_up(*names: str):
+    """Build resources ahead of the first request (default: everything
+    retrieval needs; the LLM client is cheap and connects lazily anyway).
+    """
+    for name in names or ("embeddings", "vector_store", "lexical_index", "answer_cache"):
+        registry.get(name)
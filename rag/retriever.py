@@ -1,35 +1,309 @@
-import streamlit as st
+import os, time, threading, hashlib, uuid
+from typing import Iterable, Iterator, Union
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_ollama import OllamaEmbeddings
 
-import chromadb
-from langchain_community.vectorstores import Chroma
+from scraper import logging as log
+from scraper import metrics
+from .config import CHROMA_DIR, INDEX_FLUSH_CHUNKS, INDEX_FLUSH_SECONDS, TOP_K, DENSE_K, LEXICAL_K, RRF_K
+from .lexical import get_lexical_index
+from .resources import registry, get_vector_store
+
+_CORPUS_VERSION_PATH = os.path.join(CHROMA_DIR, "corpus_version")
+
 
 def get_vs():
-    if "embeddings" not in st.session_state:
-        st.session_state.embeddings = OllamaEmbeddings(model="llama3.1:8b")
-    if "vector_store" not in st.session_state:
-        persist_dir = "data/chroma_db"  # folder where vectors will be saved
-        st.session_state.vector_store = Chroma(
-            collection_name="rag_collection",
-            embedding_function=st.session_state.embeddings,
-            persist_directory=persist_dir
-        )
-    return st.session_state.vector_store
+    return get_vector_store()
 
 
-def chunk_and_index(text: str, meta_source: str):
-    if not text.strip():
-        return
-    splitter = RecursiveCharacterTextSplitter(chunk_size=5000, chunk_overlap=200)
-    docs = splitter.create_documents([text], metadatas=[{"source": meta_source}])
-    vs = get_vs()
-    vs.add_documents(docs)
-    # Ensure vectors are flushed to disk so they persist across app restarts
+def corpus_version() -> str:
+    """Opaque token that changes whenever indexed content changes (any process)."""
+    try:
+        with open(_CORPUS_VERSION_PATH, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def _bump_corpus_version():
+    global _search_version
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    version = uuid.uuid4().hex
+    tmp_path = f"{_CORPUS_VERSION_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, _CORPUS_VERSION_PATH)
+    # This process wrote it, so its own store already holds the change
+    _search_version = version
+
+
+# Corpus version the open vector store is known to reflect. Taken at import,
+# before any search opens the store, so a change in between is not missed.
+_search_version = corpus_version()
+_search_lock = threading.Lock()
+
+
+def _search_vs():
+    """The vector store for searches. A local Chroma client never sees
+    vectors that another process (the pipeline worker) wrote after it was
+    opened, and chromadb shares one client per path within the process, so
+    once the corpus version moves on the client cache is dropped and the
+    store reopened."""
+    global _search_version
+    version = corpus_version()
+    if version != _search_version:
+        with _search_lock:
+            if version != _search_version:
+                from chromadb.api.client import SharedSystemClient
+                # Searches still running keep the old client until they finish
+                SharedSystemClient.clear_system_cache()
+                registry.reset("vector_store")
+                _search_version = version
+    return get_vs()
+
+
+def chunk_id(source: str, content: str) -> str:
+    """Stable vector-store id for a chunk: same source + same text -> same id."""
+    return hashlib.sha256(f"{source}\0{content}".encode("utf-8")).hexdigest()
+
+
+_CHUNK_SIZE = 5000
+_CHUNK_OVERLAP = 200
+# Text is split in windows of this many characters, so a document's chunks
+# come out as it is read instead of after the whole text is in memory
+_SPLIT_WINDOW = _CHUNK_SIZE * 4
+
+
+def _iter_split(text: Union[str, Iterable[str]], meta_source: str) -> Iterator[Document]:
+    """Yield the chunks of `text`: a str, or an iterable of str pieces read
+    as one text (e.g. a file in blocks). Each full window is split, all but
+    its last chunk are emitted, and the text from that chunk on is carried
+    into the next window. Windows are cut at fixed offsets, so the chunks do
+    not depend on how the text was divided into pieces.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=_CHUNK_SIZE, chunk_overlap=_CHUNK_OVERLAP)
+    buf = ""
+    for piece in ([text] if isinstance(text, str) else text):
+        buf += piece
+        while len(buf) >= _SPLIT_WINDOW:
+            window, rest = buf[:_SPLIT_WINDOW], buf[_SPLIT_WINDOW:]
+            chunks = splitter.split_text(window)
+            if not chunks:
+                buf = rest
+                continue
+            for content in chunks[:-1]:
+                yield Document(page_content=content, metadata={"source": meta_source})
+            last = chunks[-1]
+            start = window.rfind(last)
+            if start < 0:
+                carry = last + "\n"
+            else:
+                # Keep the whitespace after it (bounded) so words do not run together
+                carry = window[start:start + len(last) + _CHUNK_OVERLAP]
+            buf = carry + rest
+    if buf.strip():
+        for content in splitter.split_text(buf):
+            yield Document(page_content=content, metadata={"source": meta_source})
+
+
+def _split(text: Union[str, Iterable[str]], meta_source: str):
+    # Identical chunks within one file collapse onto one id
+    by_id = {}
+    for doc in _iter_split(text, meta_source):
+        by_id.setdefault(chunk_id(meta_source, doc.page_content), doc)
+    return by_id
+
+
+def _existing_ids(vs, meta_source: str) -> set[str]:
     try:
-        vs.persist()
+        return set(vs.get(where={"source": meta_source}, include=[])["ids"])
     except Exception:
-        # Some vector store implementations may not require/implement persist
-        pass
-    st.session_state.setdefault("indexed_sources", set()).add(meta_source)
+        return set()
+
+
+class _IndexBuffer:
+    """Chunks waiting to be embedded and written, accumulated across files."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.docs = []
+        self.ids = []
+        self.stale_ids = []
+        self.sources = []
+        self.callbacks = []
+        self.since = None
+
+
+_buffer = _IndexBuffer()
+
+
+def chunk_and_index(text: Union[str, Iterable[str]], meta_source: str, on_indexed=None, on_failed=None):
+    """Chunk `text` (a str, or an iterable of str pieces such as a file read
+    in blocks) and queue it for indexing.
+
+    Chunks from many files are embedded and written together once
+    RAG_INDEX_FLUSH_CHUNKS are pending or the oldest pending chunk is older
+    than RAG_INDEX_FLUSH_SECONDS; call `flush_index()` at the end of a run.
+    Chunks are queued as they are produced, so a long document may flush
+    part-way through and is never held whole. `on_indexed()` is called once
+    all of this file's chunks are in the store. If a flush during this call
+    drops the file's chunks, the error is raised here; if a later flush
+    drops them (or `on_indexed` raises), `on_failed(error)` is called
+    instead. Either way the file is retried on the next run.
+
+    Chunk ids are derived from source and content, so re-indexing a source
+    only embeds chunks that are new and deletes those whose text went away.
+    """
+    with metrics.timed("chroma_read", source=meta_source):
+        existing = _existing_ids(get_vs(), meta_source)
+    seen = set()
+    queued = False
+    chunking = 0.0
+    chunks = _iter_split(text, meta_source)
+    while True:
+        started = time.perf_counter()
+        doc = next(chunks, None)
+        chunking += time.perf_counter() - started
+        if doc is None:
+            break
+        cid = chunk_id(meta_source, doc.page_content)
+        if cid in seen:
+            # Identical chunks within one file collapse onto one id
+            continue
+        seen.add(cid)
+        if cid in existing:
+            continue
+        error = _queue_chunks([doc], [cid], [], meta_source)
+        if error is not None:
+            # The partial file was dropped with the failed flush
+            chunks.close()
+            raise error
+        queued = True
+    metrics.observe("stage_seconds", chunking, stage="chunk")
+    stale_ids = [cid for cid in existing if cid not in seen]
+    if not queued and not stale_ids:
+        if on_indexed:
+            on_indexed()
+        return
+    error = _queue_chunks([], [], stale_ids, meta_source, (on_indexed, on_failed))
+    if error is not None:
+        raise error
+
+
+def _queue_chunks(docs, ids, stale_ids, meta_source, callbacks=None):
+    """Add to the index buffer and flush it if due; returns the error if that
+    flush failed (the caller reports it for this file, `callbacks` included)."""
+    with _buffer.lock:
+        if _buffer.since is None:
+            _buffer.since = time.monotonic()
+        _buffer.docs.extend(docs)
+        _buffer.ids.extend(ids)
+        _buffer.stale_ids.extend(stale_ids)
+        if not _buffer.sources or _buffer.sources[-1] != meta_source:
+            _buffer.sources.append(meta_source)
+        if callbacks:
+            _buffer.callbacks.append(callbacks)
+        due = (
+            len(_buffer.docs) >= INDEX_FLUSH_CHUNKS
+            or time.monotonic() - _buffer.since >= INDEX_FLUSH_SECONDS
+        )
+    return _flush(current=callbacks) if due else None
+
+
+def flush_index() -> bool:
+    """Embed and write all pending chunks, then run their callbacks.
+    On failure the pending files are dropped and their `on_failed` is
+    called (they stay unprocessed and are retried on the next run);
+    returns False.
+    """
+    return _flush() is None
+
+
+def _run_callback(callback, *args):
+    try:
+        callback(*args)
+    except Exception as e:
+        log.error("index_callback_failed", error=str(e))
+
+
+def _flush(current=None):
+    """flush_index(); returns the error if the flush failed. The `current`
+    callbacks are left to the caller, which raises the error instead."""
+    with _buffer.lock:
+        docs, ids, stale_ids = _buffer.docs, _buffer.ids, _buffer.stale_ids
+        sources, callbacks = _buffer.sources, _buffer.callbacks
+        _buffer.docs, _buffer.ids, _buffer.stale_ids = [], [], []
+        _buffer.sources, _buffer.callbacks, _buffer.since = [], [], None
+        if not docs and not stale_ids and not callbacks:
+            return None
+        try:
+            vs = get_vs()
+            # A source re-queued before a flush may repeat ids; the latest wins
+            pending = dict(zip(ids, docs))
+            stale_ids = [cid for cid in dict.fromkeys(stale_ids) if cid not in pending]
+            if stale_ids:
+                with metrics.timed("chroma_delete", chunks=len(stale_ids)):
+                    vs.delete(ids=stale_ids)
+                with metrics.timed("lexical_write", chunks=len(stale_ids)):
+                    get_lexical_index().delete(stale_ids)
+            if pending:
+                # Includes embedding the chunks (see the "embed" stage)
+                with metrics.timed("chroma_write", chunks=len(pending)):
+                    vs.add_documents(list(pending.values()), ids=list(pending))
+                with metrics.timed("lexical_write", chunks=len(pending)):
+                    get_lexical_index().add(
+                        [(cid, doc.metadata.get("source"), doc.page_content) for cid, doc in pending.items()]
+                    )
+            if pending or stale_ids:
+                _bump_corpus_version()
+                # Ensure vectors are flushed to disk so they persist across app restarts
+                try:
+                    vs.persist()
+                except Exception:
+                    # Some vector store implementations may not require/implement persist
+                    pass
+        except Exception as e:
+            log.error("index_flush_failed", sources=sources, chunks=len(docs), error=str(e))
+            error = e
+        else:
+            error = None
+    if error is not None:
+        for pair in callbacks:
+            if pair is not current and pair[1]:
+                _run_callback(pair[1], error)
+        return error
+    for on_indexed, on_failed in callbacks:
+        try:
+            if on_indexed:
+                on_indexed()
+        except Exception as e:
+            if on_failed:
+                _run_callback(on_failed, e)
+            else:
+                log.error("index_callback_failed", error=str(e))
+    return None
+
+
+def hybrid_search(question: str, k: int = TOP_K) -> list:
+    """Fuse dense (Chroma) and lexical (BM25) hits with reciprocal rank fusion.
+    Returns up to `k` Documents, best first.
+    """
+    ranked = []
+    with metrics.timed("dense_search"):
+        dense = _search_vs().similarity_search(question, k=DENSE_K)
+    ranked.append([(chunk_id(d.metadata.get("source", ""), d.page_content), d) for d in dense])
+    if LEXICAL_K:
+        with metrics.timed("lexical_search"):
+            lexical = get_lexical_index().search(question, k=LEXICAL_K)
+        ranked.append([
+            (cid, Document(page_content=content, metadata={"source": source}))
+            for cid, source, content, _ in lexical
+        ])
+
+    scores, docs = {}, {}
+    for hits in ranked:
+        for rank, (cid, doc) in enumerate(hits):
+            scores[cid] = scores.get(cid, 0.0) + 1.0 / (RRF_K + rank + 1)
+            docs.setdefault(cid, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[cid] for cid in best]
@@ -3,55 +3,75 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")
 
 
 import streamlit as st
-from pipeline.run import run_pipeline
-from rag.api import retrieve_and_answer
-from scraper import logging as log
+from rag.api import stream_answer
+from rag.resources import warm_up
+from scraper.models import init_db, enqueue_job, get_job, list_jobs
+from scraper import metrics
+
+JOB_POLL_SECONDS = 2
 
 st.set_page_config(page_title="MoSPI AI Crawler + RAG", page_icon="📄")
+
+
+@st.cache_resource
+def _warm_up_resources():
+    # Once per server process: open Chroma, the embedder and caches before the first question
+    warm_up()
+    metrics.start_exporters()
+    return True
+
+
+_warm_up_resources()
+init_db()
 st.title("MoSPI AI Crawler + RAG")
 
 url = st.text_input("Enter MoSPI Press Release URL")
-use_ocr = st.toggle("🔎 Use OCR fallback for scanned PDFs", value=False)
+use_ocr = st.toggle("🔎 Use OCR fallback for scanned pages", value=False)
 
 col_a, col_b = st.columns(2)
 with col_a:
     if st.button("Scrape & Process PDFs"):
         if url.strip():
-            # Create a status container to show progress
-            status_container = st.empty()
-            status_container.info("Starting pipeline...")
-            
-            try:
-                # Override the logger to also show in Streamlit
-                original_log = log.info
-                def streamlit_log(message, **context):
-                    original_log(message, **context)
-                    if "url" in context:
-                        status_container.info(f"Processing: {context['url']}")
-                    elif "file_url" in context:
-                        status_container.info(f"Processing file: {context['file_url']}")
-                    elif "file_path" in context:
-                        status_container.info(f"Processing file: {context['file_path']}")
-                    elif "count" in context:
-                        status_container.info(f"Discovered {context['count']} documents")
-                
-                # Temporarily replace the logger
-                log.info = streamlit_log
-                
-                run_pipeline(url, use_ocr=use_ocr)
-                
-                # Restore original logger
-                log.info = original_log
-                
-                status_container.success("Processed PDFs successfully.")
-            except Exception as e:
-                status_container.error(f"Error: {str(e)}")
+            # Runs in the background worker; this session just follows its progress
+            st.session_state["job_id"] = enqueue_job("pipeline", {"url": url.strip(), "use_ocr": use_ocr})
         else:
             st.warning("Please enter a URL.")
 
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_status():
+    job_id = st.session_state.get("job_id")
+    if job_id is not None:
+        job = get_job(job_id)
+    else:
+        # After a refresh, keep showing the latest run
+        recent = list_jobs(limit=1)
+        job = recent[0] if recent else None
+    if job is None:
+        return
+    done = job["files_indexed"] + job["files_failed"]
+    counts = (
+        f"{job['pages_listed']} pages listed · {job['files_downloaded']} downloaded · "
+        f"{job['files_parsed']} parsed · {job['files_indexed']} indexed · {job['files_failed']} failed"
+    )
+    if job["status"] == "queued":
+        st.info(f"Job #{job['id']} queued; waiting for a worker (`python -m pipeline.worker`).")
+    elif job["status"] == "running":
+        st.info(f"Job #{job['id']} running…")
+        if job["files_total"]:
+            st.progress(min(1.0, done / job["files_total"]), text=f"{done}/{job['files_total']} files")
+        st.caption(counts)
+    elif job["status"] == "succeeded":
+        st.success(f"Job #{job['id']} finished: {counts}.")
+    else:
+        st.error(f"Job #{job['id']} failed: {job['error']}")
+
+
+_job_status()
+
 st.subheader("Ask Questions")
 q = st.chat_input("Type your question…")
 if q:
     st.chat_message("user").write(q)
-    ans = retrieve_and_answer(q)
-    st.chat_message("assistant").write(ans)
+    # Render tokens as they arrive instead of waiting for the whole answer
+    st.chat_message("assistant").write_stream(stream_answer(q))
@@ -3,167 +3,299 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")
 
 import streamlit as st
 import sqlite3
+import csv, io, math
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
+from scraper.models import load_table
 
 st.set_page_config(page_title="Database Viewer", page_icon="🗄️")
 st.title("Database Viewer - MoSPI Data")
 
 # Database path
 DB_PATH = "data/mospi.db"
+TABLES = ["documents", "files", "tables", "jobs"]
+# Legacy JSON blobs are not shown in the grid (they are still exported)
+HIDDEN_COLUMNS = {"tables": {"table_json"}}
+PAGE_SIZES = [50, 100, 500]
+EXPORT_BATCH_ROWS = 5000
 
-def get_table_data(table_name: str):
-    """Fetch data from a specific table"""
+def db_version() -> tuple:
+    """Changes whenever the database does. In WAL mode commits land in the
+    -wal file, so the main file's mtime alone would miss them."""
+    stamps = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            info = os.stat(path)
+            stamps.append((info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return tuple(stamps)
+
+def _connect() -> sqlite3.Connection:
+    # Read-only: the viewer can never take the pipeline's write lock
+    return sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, timeout=10)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_columns(table_name: str, version: tuple) -> list[tuple[str, str]]:
+    """(name, declared type) for each column; also the whitelist for filters."""
+    conn = _connect()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        query = f"SELECT * FROM {table_name}"
-        df = pd.read_sql_query(query, conn)
+        return [(row[1], (row[2] or "").upper()) for row in conn.execute(f"PRAGMA table_info({table_name})")]
+    finally:
         conn.close()
-        return df
-    except Exception as e:
-        st.error(f"Error reading {table_name}: {str(e)}")
+
+def build_where(filters: tuple, columns: list[tuple[str, str]]) -> tuple[str, list]:
+    """SQL WHERE clause for `filters` ((column, text) pairs). Text columns
+    match substrings; numeric columns take `N`, `>N`, `>=N`, `<N` or `<=N`."""
+    types = dict(columns)
+    clauses, params = [], []
+    for column, text in filters:
+        if column not in types or not text.strip():
+            continue
+        text = text.strip()
+        if types[column] in ("INTEGER", "REAL"):
+            op = next((o for o in (">=", "<=", ">", "<", "=") if text.startswith(o)), "=")
+            try:
+                value = float(text[len(op):] if text.startswith(op) else text)
+            except ValueError:
+                continue
+            clauses.append(f'"{column}" {op} ?')
+            params.append(value)
+        else:
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(f'"{column}" LIKE ? ESCAPE \'\\\'')
+            params.append(f"%{escaped}%")
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def count_rows(table_name: str, filters: tuple, version: tuple) -> int:
+    where, params = build_where(filters, get_columns(table_name, version))
+    conn = _connect()
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table_name}{where}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_page(table_name: str, filters: tuple, after_id: int, page_size: int, version: tuple) -> pd.DataFrame:
+    """One page of rows with id > `after_id` (keyset pagination: no OFFSET
+    scan, however deep the page)."""
+    columns = get_columns(table_name, version)
+    hidden = HIDDEN_COLUMNS.get(table_name, set())
+    select = ", ".join(f'"{name}"' for name, _ in columns if name not in hidden)
+    where, params = build_where(filters, columns)
+    where = f"{where} AND id > ?" if where else " WHERE id > ?"
+    conn = _connect()
+    try:
+        return pd.read_sql_query(
+            f"SELECT {select} FROM {table_name}{where} ORDER BY id LIMIT ?", conn, params=params + [after_id, page_size]
+        )
+    finally:
+        conn.close()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_overview(version: tuple) -> list[tuple[str, int]]:
+    conn = _connect()
+    try:
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+        return [(name, conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]) for name in names]
+    finally:
+        conn.close()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_statistics(table_name: str, version: tuple) -> list[str]:
+    """Whole-table statistics, aggregated in SQL."""
+    conn = _connect()
+    try:
+        if table_name == "documents":
+            low, high = conn.execute("SELECT MIN(date_published), MAX(date_published) FROM documents").fetchone()
+            categories = [r[0] for r in conn.execute(
+                "SELECT DISTINCT category FROM documents WHERE category IS NOT NULL ORDER BY category LIMIT 50"
+            )]
+            return [f"- Date range: {low} to {high}", f"- Categories: {', '.join(categories)}"]
+        if table_name == "files":
+            total, downloaded, processed = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(downloaded), 0), COALESCE(SUM(processed), 0) FROM files"
+            ).fetchone()
+            if not total:
+                return []
+            return [
+                f"- Downloaded: {downloaded}/{total} ({downloaded/total*100:.1f}%)",
+                f"- Processed: {processed}/{total} ({processed/total*100:.1f}%)",
+            ]
+        return []
+    finally:
+        conn.close()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def get_extracted_table(table_id: int, version: tuple):
+    return load_table(table_id)
+
+def _arrow_type(declared: str):
+    return {"INTEGER": pa.int64(), "REAL": pa.float64()}.get(declared, pa.string())
+
+def export_table(table_name: str, filters: tuple, fmt: str, version: tuple) -> io.BytesIO:
+    """Encode the (filtered) table as CSV or Parquet, reading it from SQLite
+    in batches of EXPORT_BATCH_ROWS: only the encoded file is held (which
+    download_button needs anyway), never the table in pandas, and nothing
+    is written to the working directory."""
+    columns = get_columns(table_name, version)
+    where, params = build_where(filters, columns)
+    out = io.BytesIO()
+    conn = _connect()
+    try:
+        cur = conn.execute(f"SELECT * FROM {table_name}{where} ORDER BY id", params)
+        names = [c[0] for c in cur.description]
+        if fmt == "csv":
+            text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+            writer = csv.writer(text)
+            writer.writerow(names)
+            while rows := cur.fetchmany(EXPORT_BATCH_ROWS):
+                writer.writerows(rows)
+            text.flush()
+            text.detach()
+        else:
+            types = dict(columns)
+            schema = pa.schema([(name, _arrow_type(types.get(name, ""))) for name in names])
+            with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+                while rows := cur.fetchmany(EXPORT_BATCH_ROWS):
+                    writer.write_batch(pa.record_batch(
+                        [pa.array([r[i] for r in rows], type=field.type) for i, field in enumerate(schema)],
+                        schema=schema,
+                    ))
+    finally:
+        conn.close()
+    out.seek(0)
+    return out
+
+def show_filters(table_name: str, columns: list[tuple[str, str]]) -> tuple:
+    hidden = HIDDEN_COLUMNS.get(table_name, set())
+    filters = []
+    with st.expander("Filters"):
+        st.caption("Text columns match substrings; numeric columns take N, >N, >=N, <N or <=N.")
+        cols = st.columns(3)
+        for i, (name, _) in enumerate(c for c in columns if c[0] not in hidden):
+            value = cols[i % 3].text_input(name, key=f"filter_{table_name}_{name}")
+            if value.strip():
+                filters.append((name, value))
+    return tuple(filters)
+
+def _page_stack(key: tuple) -> list:
+    # Keyset cursors (the last id of each previous page); reset when the view changes
+    state = st.session_state.get("pager")
+    if state is None or state["key"] != key:
+        state = st.session_state["pager"] = {"key": key, "after": [0]}
+    return state["after"]
+
+def format_table_data(table_name: str, version: tuple) -> pd.DataFrame:
+    """Show one page of the table (with filters) and return it"""
+    columns = get_columns(table_name, version)
+    filters = show_filters(table_name, columns)
+    page_size = st.sidebar.selectbox("Rows per page", PAGE_SIZES, key="page_size")
+    total = count_rows(table_name, filters, version)
+    if total == 0:
+        st.info(f"No data in {table_name} table" + (" matching the filters" if filters else ""))
         return pd.DataFrame()
 
-def format_table_data(df: pd.DataFrame, table_name: str):
-    """Format and display table data"""
-    if df.empty:
-        st.info(f"No data in {table_name} table")
-        return
-    
+    after = _page_stack((table_name, filters, page_size))
+    df = get_page(table_name, filters, after[-1], page_size, version)
+    page_number = len(after)
+    pages = math.ceil(total / page_size)
+
     st.subheader(f"{table_name.title()} Table")
-    st.write(f"**Total rows:** {len(df)}")
-    
-    # Display the dataframe
-    st.dataframe(df, use_container_width=True)
-    
-    # Show sample data if table is large
-    if len(df) > 10:
-        st.write("**Sample data (first 10 rows):**")
-        st.dataframe(df.head(10), use_container_width=True)
+    st.write(f"**Total rows:** {total} · page {page_number} of {pages}")
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    prev_col, next_col = st.columns(2)
+    if prev_col.button("← Previous", disabled=page_number == 1):
+        after.pop()
+        st.rerun()
+    if next_col.button("Next →", disabled=page_number >= pages or df.empty):
+        after.append(int(df["id"].iloc[-1]))
+        st.rerun()
+
+    st.sidebar.write("---")
+    st.sidebar.write(f"**Export {table_name}**" + (" (filtered)" if filters else ""))
+    fmt = st.sidebar.radio("Format", ["csv", "parquet"], horizontal=True, key="export_format")
+    if st.sidebar.button("Prepare export"):
+        try:
+            with st.spinner("Exporting..."):
+                data = export_table(table_name, filters, fmt, version)
+            st.sidebar.download_button(
+                label=f"Download {table_name}.{fmt}",
+                data=data,
+                file_name=f"mospi_{table_name}.{fmt}",
+                mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+            )
+        except Exception as e:
+            st.sidebar.error(f"Error creating export: {str(e)}")
+    return df
 
 def main():
     if not os.path.exists(DB_PATH):
         st.error("Database not found. Please run the scraper first to create the database.")
         return
-    
+    version = db_version()
+
     # Sidebar for navigation
     st.sidebar.title("Navigation")
     page = st.sidebar.selectbox(
         "Select Table to View",
-        ["Overview", "documents", "files", "tables"]
+        ["Overview"] + TABLES
     )
-    
+
     if page == "Overview":
         st.header("Database Overview")
-        
-        # Get table counts
+
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Get table names
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = cursor.fetchall()
-            
             st.write("**Available Tables:**")
-            for table in tables:
-                table_name = table[0]
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                count = cursor.fetchone()[0]
+            for table_name, count in get_overview(version):
                 st.write(f"- **{table_name}**: {count} rows")
-            
-            conn.close()
-            
+
             st.write("---")
             st.write("**Database Location:**", DB_PATH)
-            st.write("**Last Updated:**", datetime.fromtimestamp(os.path.getmtime(DB_PATH)).strftime("%Y-%m-%d %H:%M:%S"))
-            
+            updated = max(os.path.getmtime(p) for p in (DB_PATH, DB_PATH + "-wal") if os.path.exists(p))
+            st.write("**Last Updated:**", datetime.fromtimestamp(updated).strftime("%Y-%m-%d %H:%M:%S"))
+
         except Exception as e:
             st.error(f"Error reading database overview: {str(e)}")
-    
-    elif page == "documents":
-        st.header("Documents Table")
-        df = get_table_data("documents")
-        format_table_data(df, "documents")
-        
-        # Show some statistics
-        if not df.empty:
-            st.write("---")
-            st.write("**Statistics:**")
-            if 'date_published' in df.columns:
-                st.write(f"- Date range: {df['date_published'].min()} to {df['date_published'].max()}")
-            if 'category' in df.columns:
-                st.write(f"- Categories: {', '.join(df['category'].unique())}")
-    
-    elif page == "files":
-        st.header("Files Table")
-        df = get_table_data("files")
-        format_table_data(df, "files")
-        
-        # Show some statistics
-        if not df.empty:
-            st.write("---")
-            st.write("**Statistics:**")
-            if 'downloaded' in df.columns:
-                downloaded = df['downloaded'].sum()
-                total = len(df)
-                st.write(f"- Downloaded: {downloaded}/{total} ({downloaded/total*100:.1f}%)")
-            if 'processed' in df.columns:
-                processed = df['processed'].sum()
-                st.write(f"- Processed: {processed}/{total} ({processed/total*100:.1f}%)")
-    
-    elif page == "tables":
-        st.header("Extracted Tables")
-        df = get_table_data("tables")
-        format_table_data(df, "tables")
-        
-        # Show table details
-        if not df.empty:
-            st.write("---")
-            st.write("**Table Details:**")
-            
-            # Show sample table content
-            for idx, row in df.head(5).iterrows():
-                st.write(f"**Table {idx + 1}:** {row['n_rows']} rows × {row['n_cols']} columns")
-                if 'table_json' in row and row['table_json']:
-                    try:
-                        import json
-                        table_data = json.loads(row['table_json'])
-                        if table_data:
-                            table_df = pd.DataFrame(table_data)
-                            st.dataframe(table_df, use_container_width=True)
-                    except:
-                        st.write("Could not parse table data")
-                st.write("---")
-    
-    # Download option
-    st.sidebar.write("---")
-    if st.sidebar.button("Download All Data"):
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            
-            # Create Excel file with all tables
-            with pd.ExcelWriter('mospi_database_export.xlsx', engine='openpyxl') as writer:
-                for table_name in ['documents', 'files', 'tables']:
-                    df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-                    df.to_excel(writer, sheet_name=table_name, index=False)
-            
-            conn.close()
-            
-            # Read the file and provide download
-            with open('mospi_database_export.xlsx', 'rb') as f:
-                st.sidebar.download_button(
-                    label="Download Excel File",
-                    data=f.read(),
-                    file_name="mospi_database_export.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            
-            # Clean up
-            os.remove('mospi_database_export.xlsx')
-            
-        except Exception as e:
-            st.sidebar.error(f"Error creating export: {str(e)}")
+        return
+
+    st.header({"documents": "Documents Table", "files": "Files Table", "tables": "Extracted Tables", "jobs": "Jobs"}[page])
+    try:
+        df = format_table_data(page, version)
+        statistics = get_statistics(page, version)
+    except Exception as e:
+        st.error(f"Error reading {page}: {str(e)}")
+        return
+
+    if statistics:
+        st.write("---")
+        st.write("**Statistics:**")
+        for line in statistics:
+            st.write(line)
+
+    if page == "tables" and not df.empty:
+        st.write("---")
+        st.write("**Table Details:**")
+
+        # Cells are read from the table's Parquet file only for the table picked here
+        labels = {
+            r.id: f"#{r.id} (file {r.source_file_id}, page {r.page_number})"
+            for r in df[['id', 'source_file_id', 'page_number']].itertuples(index=False)
+        }
+        table_id = st.selectbox("Table", list(labels), format_func=labels.get)
+        if table_id is not None:
+            row = df[df['id'] == table_id].iloc[0]
+            st.write(f"**Table {table_id}:** {row['n_rows']} rows × {row['n_cols']} columns")
+            try:
+                table_df = get_extracted_table(int(table_id), version)
+                if table_df is not None:
+                    st.dataframe(table_df, use_container_width=True)
+            except Exception as e:
+                st.write(f"Could not load table data: {e}")
 
 if __name__ == "__main__":
     main()
@@ -29,4 +29,39 @@ BACKOFF_BASE_SECONDS = get_float("SCRAPER_BACKOFF_BASE_SECONDS", 1.0)
 RATE_LIMIT_SECONDS = get_float("SCRAPER_RATE_LIMIT_SECONDS", 0.5)
 RESPECT_ROBOTS = get_bool("SCRAPER_RESPECT_ROBOTS", False)
 MAX_PAGES_PER_SEED = get_int("SCRAPER_MAX_PAGES_PER_SEED", 5)
-CONCURRENCY = get_int("SCRAPER_CONCURRENCY", 1)  # placeholder for future use
+CONCURRENCY = max(1, get_int("SCRAPER_CONCURRENCY", 1))
+# Token-bucket burst per host; the refill rate is 1 / RATE_LIMIT_SECONDS.
+RATE_LIMIT_BURST = max(1, get_int("SCRAPER_RATE_LIMIT_BURST", 1))
+HTTP_CACHE_ENABLED = get_bool("SCRAPER_HTTP_CACHE_ENABLED", True)
+HTTP_CACHE_DIR = os.getenv("SCRAPER_HTTP_CACHE_DIR", "data/http_cache")
+HTTP_CACHE_MAX_MB = get_int("SCRAPER_HTTP_CACHE_MAX_MB", 256)
+DOWNLOAD_CHUNK_BYTES = max(8192, get_int("SCRAPER_DOWNLOAD_CHUNK_BYTES", 64 * 1024))
+
+# Pipeline execution
+PIPELINE_PIPELINED = get_bool("PIPELINE_PIPELINED", True)
+PIPELINE_PARSE_WORKERS = max(1, get_int("PIPELINE_PARSE_WORKERS", os.cpu_count() or 1))
+PIPELINE_QUEUE_SIZE = max(1, get_int("PIPELINE_QUEUE_SIZE", 4))
+
+# Background worker (python -m pipeline.worker)
+WORKER_POLL_SECONDS = max(0.1, get_float("WORKER_POLL_SECONDS", 2.0))
+WORKER_HEARTBEAT_SECONDS = max(1.0, get_float("WORKER_HEARTBEAT_SECONDS", 15.0))
+WORKER_STALE_SECONDS = max(WORKER_HEARTBEAT_SECONDS * 2, get_float("WORKER_STALE_SECONDS", 120.0))
+
+# Metrics (scraper/metrics.py)
+METRICS_PORT = get_int("METRICS_PORT", 0)  # serve /metrics on this port; 0 disables
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")  # rewrite this file periodically; empty disables
+METRICS_EXPORT_SECONDS = max(1.0, get_float("METRICS_EXPORT_SECONDS", 15.0))
+METRICS_SLOW_SPAN_SECONDS = get_float("METRICS_SLOW_SPAN_SECONDS", 10.0)  # 0 disables slow-span logs
+
+# Logging (scraper/logging.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").strip().lower()  # debug | info | warning | error
+LOG_ASYNC = get_bool("LOG_ASYNC", True)  # write from a background thread
+LOG_QUEUE_SIZE = max(1, get_int("LOG_QUEUE_SIZE", 10000))
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")  # e.g. "slow_span=0.1,file_deduplicated=0.5"
+
+# OCR fallback (scraper/parse.py)
+OCR_MIN_CHARS = max(0, get_int("OCR_MIN_CHARS", 25))  # pages with less extracted text get OCR'd
+OCR_DPI = max(72, get_int("OCR_DPI", 300))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+# Pages OCR'd at once per parsing process; the default shares the cores with the parse pool
+OCR_WORKERS = max(1, get_int("OCR_WORKERS", (os.cpu_count() or 1) // PIPELINE_PARSE_WORKERS))
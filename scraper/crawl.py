@@ -1,22 +1,36 @@
-import os, re, hashlib
+import os, re, json, hashlib
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from .http import http_get
 from .models import compute_hash, sanitize_filename
 from . import logging as log
-from .config import MAX_PAGES_PER_SEED
+from . import metrics
+from .config import MAX_PAGES_PER_SEED, CONCURRENCY, DOWNLOAD_CHUNK_BYTES
 import datetime
 
 PDF_DIR = "data/raw"
 os.makedirs(PDF_DIR, exist_ok=True)
 
-def scrape_pdf_links(base_url: str) -> list[str]:
-    """Discover PDF links from paginated listing pages.
-    Follows pagination via anchors containing 'Next' up to MAX_PAGES_PER_SEED.
+_PDF_HREF_RE = re.compile(r"https://www\.mospi\.gov\.in/sites/default/files/press_release/.*\.pdf", re.IGNORECASE)
+_DATE_RE = re.compile(r"(\d{1,2}[\-/ ](?:[A-Za-z]{3,9}|\d{1,2})[\-/ ]\d{4})")
+_NEXT_LABELS = frozenset({"next", "next ›", "›", "older", ">>"})
+_ANCHORS_ONLY = SoupStrainer("a", href=True)
+
+try:
+    import lxml  # noqa: F401  (optional, much faster tree builder)
+    _HTML_PARSER = "lxml"
+except ImportError:
+    _HTML_PARSER = "html.parser"
+
+
+def _crawl_listing(base_url: str, with_dates: bool = True):
+    """Walk paginated listing pages from `base_url`, up to MAX_PAGES_PER_SEED.
+    Yields (page_url, entries) per page; see `extract_listing` for entries.
     """
     seen_pages = set()
     to_visit = [base_url]
-    pdf_urls = []
     pages_visited = 0
 
     while to_visit and pages_visited < MAX_PAGES_PER_SEED:
@@ -29,24 +43,20 @@ def scrape_pdf_links(base_url: str) -> list[str]:
         except Exception as e:
             log.error("listing_fetch_failed", url=url, error=str(e))
             continue
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        for a in soup.find_all("a", href=True):
-            href = a["href"].strip()
-            if re.search(r"https://www\.mospi\.gov\.in/sites/default/files/press_release/.*\.pdf", href, re.IGNORECASE):
-                pdf_urls.append(urljoin(url, href))
-
-        # Find next page link heuristically
-        next_link = None
-        for a in soup.find_all("a", href=True):
-            label = (a.get_text() or "").strip().lower()
-            if label in {"next", "next ›", "›", "older", ">>"}:
-                next_link = urljoin(url, a["href"].strip())
-                break
+        entries, next_link = extract_listing(resp.text, url, with_dates=with_dates)
+        yield url, entries
         if next_link:
             to_visit.append(next_link)
         pages_visited += 1
 
+
+def scrape_pdf_links(base_url: str) -> list[str]:
+    """Discover PDF links from paginated listing pages.
+    Follows pagination via anchors containing 'Next' up to MAX_PAGES_PER_SEED.
+    """
+    pdf_urls = []
+    for _, entries in _crawl_listing(base_url, with_dates=False):
+        pdf_urls.extend(pdf_url for pdf_url, _, _ in entries)
     # de-duplicate while preserving order
     return list(dict.fromkeys(pdf_urls))
 
@@ -77,60 +87,60 @@ def _absolute(base: str, href: str) -> str:
         return href
 
 
-def scrape_listing_and_details(base_url: str) -> list[dict]:
-    """Return a list of document dicts with metadata and file_links.
-    Document: {url, title, date_published, summary, category, file_links}
+def extract_listing(html: str, page_url: str, with_dates: bool = True):
+    """Single pass over a listing page's anchors.
+    Returns ([(pdf_url, title, date_text)], next_link). With `with_dates=False`
+    only <a href> elements are parsed and no nearby-date lookup is done.
     """
-    docs: list[dict] = []
-    seen_pages = set()
-    to_visit = [base_url]
-    pages_visited = 0
+    if with_dates:
+        soup = BeautifulSoup(html, _HTML_PARSER)
+    else:
+        soup = BeautifulSoup(html, _HTML_PARSER, parse_only=_ANCHORS_ONLY)
 
-    while to_visit and pages_visited < MAX_PAGES_PER_SEED:
-        url = to_visit.pop(0)
-        if url in seen_pages:
+    entries = []
+    next_link = None
+    parent_dates = {}
+    for a in soup.find_all("a", href=True):
+        href = a["href"].strip()
+        if not href:
             continue
-        seen_pages.add(url)
-        try:
-            resp = http_get(url)
-        except Exception as e:
-            log.error("listing_fetch_failed", url=url, error=str(e))
-            continue
-        soup = BeautifulSoup(resp.text, "html.parser")
+        label = a.get_text().strip()
+        if _PDF_HREF_RE.search(href):
+            pdf_url = _absolute(page_url, href)
+            date_text = None
+            parent = a.parent if with_dates else None
+            if parent is not None:
+                # Rows often hold several anchors; look each parent up only once
+                key = id(parent)
+                if key not in parent_dates:
+                    m = _DATE_RE.search(parent.get_text(" ", strip=True))
+                    parent_dates[key] = m.group(1) if m else None
+                date_text = parent_dates[key]
+            entries.append((pdf_url, label or os.path.basename(pdf_url), date_text))
+        elif next_link is None and label.lower() in _NEXT_LABELS:
+            next_link = _absolute(page_url, href)
+    return entries, next_link
 
-        for a in soup.find_all("a", href=True):
-            href = a["href"].strip()
-            if not href:
-                continue
-            if re.search(r"https://www\.mospi\.gov\.in/sites/default/files/press_release/.*\.pdf", href, re.IGNORECASE):
-                pdf_url = _absolute(url, href)
-                title = (a.get_text() or "").strip() or os.path.basename(pdf_url)
-                # Try to find a nearby date
-                date_text = None
-                parent_text = (a.find_parent().get_text(" ", strip=True) if a.find_parent() else "")
-                m = re.search(r"(\d{1,2}[\-/ ](?:[A-Za-z]{3,9}|\d{1,2})[\-/ ]\d{4})", parent_text)
-                if m:
-                    date_text = m.group(1)
-                doc = {
-                    "url": url,
-                    "title": title,
-                    "date_published": _normalize_date(date_text) or None,
-                    "summary": None,
-                    "category": "press_release",
-                    "file_links": [pdf_url],
-                }
-                docs.append(doc)
-
-        # pagination
-        next_link = None
-        for a in soup.find_all("a", href=True):
-            label = (a.get_text() or "").strip().lower()
-            if label in {"next", "next ›", "›", "older", ">>"}:
-                next_link = _absolute(url, a["href"].strip())
-                break
-        if next_link:
-            to_visit.append(next_link)
-        pages_visited += 1
+
+def scrape_listing_and_details(base_url: str, on_page=None) -> list[dict]:
+    """Return a list of document dicts with metadata and file_links.
+    Document: {url, title, date_published, summary, category, file_links}
+    `on_page(page_url)` is called after each listing page is parsed.
+    """
+    docs: list[dict] = []
+    for url, entries in _crawl_listing(base_url):
+        if on_page:
+            on_page(url)
+        for pdf_url, title, date_text in entries:
+            doc = {
+                "url": url,
+                "title": title,
+                "date_published": _normalize_date(date_text) or None,
+                "summary": None,
+                "category": "press_release",
+                "file_links": [pdf_url],
+            }
+            docs.append(doc)
 
     # de-duplicate by (title, first file link)
     seen = set()
@@ -143,17 +153,140 @@ def scrape_listing_and_details(base_url: str) -> list[dict]:
         unique_docs.append(d)
     return unique_docs
 
+def _is_complete_pdf(path: str) -> bool:
+    """Cheap integrity check: a finished PDF ends with an %%EOF marker."""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            f.seek(max(0, size - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def _hash_prefix(path: str, h) -> int:
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_BYTES), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return size
+
+
 def download_pdf_to_disk(file_url: str):
+    """Download `file_url` into PDF_DIR and return (file_path, sha256).
+
+    Bytes stream into `<name>.part` and are hashed on the way in; the part file
+    is renamed into place only once complete. A leftover part file is resumed
+    with an HTTP Range request guarded by If-Range, using the validator of the
+    response it came from (kept in `<name>.part.meta`); without one, or if
+    the PDF changed upstream, the download starts over.
+    """
     tail = file_url.rstrip("/").split("/")[-1] or hashlib.md5(file_url.encode()).hexdigest() + ".pdf"
     filename = sanitize_filename(tail)
     file_path = os.path.join(PDF_DIR, filename)
+    part_path = file_path + ".part"
 
     if os.path.exists(file_path):
-        return file_path, compute_hash(file_path)
-
-    with http_get(file_url, stream=True) as r:
-        with open(file_path, "wb") as f:
-            for chunk in r.iter_content(8192):
-                if chunk:
-                    f.write(chunk)
-    return file_path, compute_hash(file_path)
+        if _is_complete_pdf(file_path):
+            return file_path, compute_hash(file_path)
+        # No validator was kept for it, so it cannot be resumed safely
+        log.warn("pdf_incomplete_on_disk", file_path=file_path)
+        os.remove(file_path)
+
+    with metrics.timed("download", url=file_url):
+        return _download_part(file_url, file_path, part_path)
+
+
+def _resume_validator(response) -> str | None:
+    """Value for If-Range: a strong ETag, else Last-Modified (weak ETags are not allowed)."""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _read_validator(meta_path: str) -> str | None:
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f).get("validator")
+    except (OSError, ValueError):
+        return None
+
+
+def _discard_part(part_path: str, meta_path: str):
+    for path in (part_path, meta_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _download_part(file_url: str, file_path: str, part_path: str):
+    meta_path = part_path + ".meta"
+    for attempt in range(2):
+        h = hashlib.sha256()
+        offset = 0
+        validator = None
+        if os.path.exists(part_path):
+            validator = _read_validator(meta_path)
+            if validator:
+                offset = _hash_prefix(part_path, h)
+            else:
+                # Without a validator a 206 could be a different version of the file
+                _discard_part(part_path, meta_path)
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else None
+        try:
+            r = http_get(file_url, stream=True, headers=headers)
+        except requests.HTTPError as e:
+            # 416: the part file is not a prefix the server recognises; start over
+            if offset and e.response is not None and e.response.status_code == 416 and attempt == 0:
+                _discard_part(part_path, meta_path)
+                continue
+            raise
+        with r:
+            if offset and r.status_code != 206:
+                # The file changed upstream (If-Range failed) or the server
+                # ignored the Range header: it sent the whole body
+                h = hashlib.sha256()
+                offset = 0
+            if not offset:
+                # Remember what this body is, so an interrupted download can resume
+                new_validator = _resume_validator(r)
+                if new_validator:
+                    with open(meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"url": file_url, "validator": new_validator}, f)
+                elif os.path.exists(meta_path):
+                    os.remove(meta_path)
+            # Content-Length counts encoded bytes; only compare for identity bodies
+            expected = None if r.headers.get("Content-Encoding") else r.headers.get("Content-Length")
+            written = 0
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in r.iter_content(DOWNLOAD_CHUNK_BYTES):
+                    if chunk:
+                        f.write(chunk)
+                        h.update(chunk)
+                        written += len(chunk)
+            metrics.inc("download_bytes_total", written)
+        if expected is not None and written != int(expected):
+            raise IOError(f"Incomplete download of {file_url}: {written}/{expected} bytes (will retry)")
+        os.replace(part_path, file_path)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        return file_path, h.hexdigest()
+    raise IOError(f"Could not download {file_url}")
+
+
+def download_pdfs(file_urls: list[str], concurrency: int = None):
+    """Download many PDFs keeping up to `concurrency` requests in flight.
+    Yields (file_url, file_path, file_hash, error) in completion order; the
+    per-host token bucket in http.py still bounds the request rate.
+    """
+    workers = max(1, concurrency or CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as pool:
+        futures = {pool.submit(download_pdf_to_disk, u): u for u in file_urls}
+        for fut in as_completed(futures):
+            file_url = futures[fut]
+            try:
+                file_path, file_hash = fut.result()
+                yield file_url, file_path, file_hash, None
+            except Exception as e:
+                yield file_url, None, None, e
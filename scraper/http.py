@@ -1,15 +1,49 @@
-import time, random
+import time, random, threading
 from urllib.parse import urlparse
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from .config import USER_AGENT, REQUEST_TIMEOUT_SECONDS, MAX_RETRIES, BACKOFF_BASE_SECONDS, RATE_LIMIT_SECONDS, RESPECT_ROBOTS
+from .config import (
+	USER_AGENT, REQUEST_TIMEOUT_SECONDS, MAX_RETRIES, BACKOFF_BASE_SECONDS, RATE_LIMIT_SECONDS, RESPECT_ROBOTS,
+	CONCURRENCY, RATE_LIMIT_BURST, HTTP_CACHE_ENABLED, HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB,
+)
+from .http_cache import ResponseCache
 from . import logging as log
+from . import metrics
 
 
 _session = None
-_last_request_time = 0.0
+_session_lock = threading.Lock()
+_buckets = {}
+_buckets_lock = threading.Lock()
 _robots_cache = {}
+_response_cache = None
+
+
+class TokenBucket:
+	"""Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+	def __init__(self, rate: float, capacity: int = 1):
+		self.rate = rate
+		self.capacity = capacity
+		self._tokens = float(capacity)
+		self._updated = time.monotonic()
+		self._lock = threading.Lock()
+
+	def acquire(self):
+		"""Block until a token is available, then consume it."""
+		if self.rate <= 0:
+			return
+		while True:
+			with self._lock:
+				now = time.monotonic()
+				self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+				self._updated = now
+				if self._tokens >= 1:
+					self._tokens -= 1
+					return
+				to_sleep = (1 - self._tokens) / self.rate
+			time.sleep(to_sleep)
 
 
 def _build_session() -> requests.Session:
@@ -21,25 +55,43 @@ def _build_session() -> requests.Session:
 		status_forcelist=[429, 500, 502, 503, 504],
 		allowed_methods=["GET", "HEAD"],
 	)
-	s.mount("http://", HTTPAdapter(max_retries=retry))
-	s.mount("https://", HTTPAdapter(max_retries=retry))
+	# Size the per-host pool so concurrent workers never wait on (or discard) connections
+	pool_size = max(CONCURRENCY, 10)
+	adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+	s.mount("http://", adapter)
+	s.mount("https://", adapter)
 	return s
 
 
 def get_session() -> requests.Session:
 	global _session
 	if _session is None:
-		_session = _build_session()
+		with _session_lock:
+			if _session is None:
+				_session = _build_session()
 	return _session
 
 
-def _rate_limit_wait():
-	global _last_request_time
-	delta = time.time() - _last_request_time
-	to_sleep = RATE_LIMIT_SECONDS - delta
-	if to_sleep > 0:
-		time.sleep(to_sleep)
-	_last_request_time = time.time()
+def get_response_cache() -> ResponseCache:
+	global _response_cache
+	if _response_cache is None:
+		with _session_lock:
+			if _response_cache is None:
+				_response_cache = ResponseCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB * 1024 * 1024)
+	return _response_cache
+
+
+def _get_bucket(host: str) -> TokenBucket:
+	with _buckets_lock:
+		bucket = _buckets.get(host)
+		if bucket is None:
+			rate = 1.0 / RATE_LIMIT_SECONDS if RATE_LIMIT_SECONDS > 0 else 0.0
+			bucket = _buckets[host] = TokenBucket(rate, RATE_LIMIT_BURST)
+		return bucket
+
+
+def _rate_limit_wait(url: str):
+	_get_bucket(urlparse(url).netloc).acquire()
 
 
 def _is_allowed_by_robots(url: str) -> bool:
@@ -58,13 +110,40 @@ def _is_allowed_by_robots(url: str) -> bool:
 	return _robots_cache[root]
 
 
-def http_get(url: str, **kwargs) -> requests.Response:
+def http_get(url: str, use_cache: bool = None, **kwargs) -> requests.Response:
+	"""GET `url` politely. Non-streamed responses go through the on-disk cache:
+	stored validators are sent as If-None-Match/If-Modified-Since and a 304 is
+	answered from the local copy (the returned response has `from_cache=True`).
+	"""
 	if not _is_allowed_by_robots(url):
 		raise RuntimeError(f"Blocked by robots.txt: {url}")
-	_rate_limit_wait()
+	if use_cache is None:
+		use_cache = HTTP_CACHE_ENABLED and not kwargs.get("stream")
+	cache = get_response_cache() if use_cache else None
+	entry = cache.lookup(url) if cache else None
+	base_headers = kwargs.pop("headers", None)
+	headers = dict(base_headers or {})
+	if entry:
+		headers.update(cache.conditional_headers(entry))
+	# Politeness waits are expected to be long under load; time them without slow-span logs
+	with metrics.timed("rate_limit_wait", slow_seconds=0):
+		_rate_limit_wait(url)
 	try:
-		resp = get_session().get(url, timeout=REQUEST_TIMEOUT_SECONDS, **kwargs)
+		with metrics.timed("http_get", url=url):
+			resp = get_session().get(url, timeout=REQUEST_TIMEOUT_SECONDS, headers=headers, **kwargs)
+		metrics.inc("http_requests_total", status=str(resp.status_code))
+		if resp.status_code == 304 and entry:
+			try:
+				served = cache.serve(entry, resp)
+				metrics.inc("http_cache_hits_total")
+				return served
+			except FileNotFoundError:
+				# Evicted between lookup and serve; fetch the full body instead
+				cache.delete(url)
+				return http_get(url, use_cache=use_cache, headers=base_headers, **kwargs)
 		resp.raise_for_status()
+		if cache and resp.status_code == 200:
+			cache.store(url, resp)
 		return resp
 	except Exception as e:
 		log.error("http_get_failed", url=url, error=str(e))
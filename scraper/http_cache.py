@@ -0,0 +1,153 @@
+import os, hashlib, sqlite3, threading, time
+from contextlib import contextmanager
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class ResponseCache:
+	"""Persistent, size-capped LRU cache of GET responses keyed by URL.
+
+	Bodies live in one file per URL under `cache_dir`; validators (ETag,
+	Last-Modified) and access times live in a small SQLite index next to them.
+	Only responses that carry a validator are stored, since those are the only
+	ones that can be revalidated cheaply.
+	"""
+
+	def __init__(self, cache_dir: str, max_bytes: int):
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+		self.index_path = os.path.join(cache_dir, "index.db")
+		self._lock = threading.Lock()
+		os.makedirs(cache_dir, exist_ok=True)
+		with self._connect() as conn:
+			conn.execute(
+				"""
+				CREATE TABLE IF NOT EXISTS entries (
+					url TEXT PRIMARY KEY,
+					etag TEXT,
+					last_modified TEXT,
+					content_type TEXT,
+					encoding TEXT,
+					body_file TEXT,
+					size INTEGER,
+					last_access REAL
+				)
+				"""
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+
+	@contextmanager
+	def _connect(self):
+		conn = sqlite3.connect(self.index_path, timeout=30)
+		try:
+			with conn:
+				yield conn
+		finally:
+			conn.close()
+
+	def _body_path(self, body_file: str) -> str:
+		return os.path.join(self.cache_dir, body_file)
+
+	def lookup(self, url: str) -> dict | None:
+		with self._lock, self._connect() as conn:
+			row = conn.execute(
+				"SELECT etag, last_modified, content_type, encoding, body_file FROM entries WHERE url=?",
+				(url,),
+			).fetchone()
+		if not row:
+			return None
+		etag, last_modified, content_type, encoding, body_file = row
+		if not os.path.exists(self._body_path(body_file)):
+			self.delete(url)
+			return None
+		return {
+			"url": url,
+			"etag": etag,
+			"last_modified": last_modified,
+			"content_type": content_type,
+			"encoding": encoding,
+			"body_file": body_file,
+		}
+
+	def conditional_headers(self, entry: dict) -> dict:
+		headers = {}
+		if entry.get("etag"):
+			headers["If-None-Match"] = entry["etag"]
+		if entry.get("last_modified"):
+			headers["If-Modified-Since"] = entry["last_modified"]
+		return headers
+
+	def store(self, url: str, resp: requests.Response):
+		etag = resp.headers.get("ETag")
+		last_modified = resp.headers.get("Last-Modified")
+		if not (etag or last_modified):
+			return
+		body = resp.content
+		if len(body) > self.max_bytes:
+			return
+		body_file = hashlib.sha1(url.encode("utf-8")).hexdigest()
+		path = self._body_path(body_file)
+		tmp_path = f"{path}.{threading.get_ident()}.tmp"
+		with open(tmp_path, "wb") as f:
+			f.write(body)
+		os.replace(tmp_path, path)
+		with self._lock, self._connect() as conn:
+			conn.execute(
+				"""
+				INSERT OR REPLACE INTO entries (url, etag, last_modified, content_type, encoding, body_file, size, last_access)
+				VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+				""",
+				(url, etag, last_modified, resp.headers.get("Content-Type"), resp.encoding, body_file, len(body), time.time()),
+			)
+			self._evict(conn)
+
+	def serve(self, entry: dict, resp_304: requests.Response = None) -> requests.Response:
+		"""Build a 200 response from the stored body (used when the server answers 304)."""
+		with open(self._body_path(entry["body_file"]), "rb") as f:
+			body = f.read()
+		with self._lock, self._connect() as conn:
+			conn.execute("UPDATE entries SET last_access=? WHERE url=?", (time.time(), entry["url"]))
+		resp = requests.Response()
+		resp.status_code = 200
+		resp.url = entry["url"]
+		resp.headers = CaseInsensitiveDict()
+		if entry.get("content_type"):
+			resp.headers["Content-Type"] = entry["content_type"]
+		if entry.get("etag"):
+			resp.headers["ETag"] = entry["etag"]
+		if entry.get("last_modified"):
+			resp.headers["Last-Modified"] = entry["last_modified"]
+		resp.encoding = entry.get("encoding")
+		resp._content = body
+		resp._content_consumed = True
+		if resp_304 is not None:
+			resp.request = resp_304.request
+			resp.elapsed = resp_304.elapsed
+		resp.from_cache = True
+		return resp
+
+	def delete(self, url: str):
+		with self._lock, self._connect() as conn:
+			row = conn.execute("SELECT body_file FROM entries WHERE url=?", (url,)).fetchone()
+			conn.execute("DELETE FROM entries WHERE url=?", (url,))
+		if row:
+			try:
+				os.remove(self._body_path(row[0]))
+			except FileNotFoundError:
+				pass
+
+	def _evict(self, conn: sqlite3.Connection):
+		total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+		if total <= self.max_bytes:
+			return
+		for url, body_file, size in conn.execute(
+			"SELECT url, body_file, size FROM entries ORDER BY last_access ASC"
+		).fetchall():
+			if total <= self.max_bytes:
+				break
+			conn.execute("DELETE FROM entries WHERE url=?", (url,))
+			try:
+				os.remove(self._body_path(body_file))
+			except FileNotFoundError:
+				pass
+			total -= size or 0
@@ -1,17 +1,169 @@
-import json, sys, time
+"""JSON-lines logger.
+
+Entries below LOG_LEVEL are dropped before anything is built, events listed
+in LOG_SAMPLE are kept with the given probability (and carry `sample_rate`),
+and lines are written to stdout in batches by a background thread. When its
+bounded backlog (LOG_QUEUE_SIZE lines) is full the caller writes the backlog
+and then its own line synchronously instead of dropping the line. Pending
+lines are flushed at exit (of multiprocessing children too), or on demand
+with `flush()`.
+"""
+import os, sys, json, time, atexit, random, threading
+from multiprocessing import util as mp_util
+from collections import deque
 from typing import Any, Dict
 
+from .config import LOG_LEVEL, LOG_ASYNC, LOG_QUEUE_SIZE, LOG_SAMPLE
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+_FLUSH_INTERVAL = 0.1  # seconds between writer wake-ups
+
+
+def _parse_sample(spec: str) -> Dict[str, float]:
+	rates = {}
+	for item in spec.split(","):
+		name, _, rate = item.partition("=")
+		try:
+			rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+		except ValueError:
+			continue
+	return rates
+
+
+_threshold = LEVELS.get(LOG_LEVEL, LEVELS["info"])
+_sample_rates = _parse_sample(LOG_SAMPLE)
+# deque.append/popleft are atomic: callers never take a lock to enqueue
+_pending = deque()
+_high_water = max(1, LOG_QUEUE_SIZE // 2)
+_wake = threading.Event()
+_write_lock = threading.Lock()
+_writer_pid = None
+_writer_lock = threading.Lock()
+_ts_second = None
+_ts_text = ""
+
+
+def _timestamp() -> str:
+	# One strftime per second, not per entry
+	global _ts_second, _ts_text
+	now = int(time.time())
+	if now != _ts_second:
+		_ts_text = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+		_ts_second = now
+	return _ts_text
+
+
+def _drain(extra: str = "") -> list:
+	"""Write every pending line, then `extra`; returns the flush markers met.
+	Lines are popped under the write lock, so whoever writes next cannot
+	overtake a batch that was popped but not yet written."""
+	lines, markers = [], []
+	with _write_lock:
+		while _pending:
+			item = _pending.popleft()
+			if isinstance(item, str):
+				lines.append(item)
+			else:
+				markers.append(item)
+		if extra:
+			lines.append(extra)
+		if lines:
+			sys.stdout.write("".join(lines))
+			sys.stdout.flush()
+	return markers
+
+
+def _writer_loop():
+	while True:
+		_wake.wait(_FLUSH_INTERVAL)
+		_wake.clear()
+		try:
+			markers = _drain()
+		except Exception:
+			markers = []  # stdout is gone; nothing sensible left to report to
+		for done in markers:
+			done.set()
+
+
+def _ensure_writer():
+	"""Start the writer thread once per process (again after a fork)."""
+	global _writer_pid
+	pid = os.getpid()
+	if _writer_pid == pid:
+		return
+	with _writer_lock:
+		if _writer_pid != pid:
+			threading.Thread(target=_writer_loop, name="log-writer", daemon=True).start()
+			_writer_pid = pid
+			# multiprocessing children (e.g. pool workers) leave via os._exit and
+			# skip atexit; their exit path runs these finalizers instead
+			mp_util.Finalize(None, flush, exitpriority=0)
+
+
+def _reset_after_fork():
+	# The parent's queued lines are its own to write, and its locks may be held
+	global _pending, _wake, _write_lock, _writer_lock, _writer_pid
+	_pending = deque()
+	_wake = threading.Event()
+	_write_lock = threading.Lock()
+	_writer_lock = threading.Lock()
+	_writer_pid = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 def log(level: str, message: str, **context: Dict[str, Any]):
+	level = level.lower()
+	if LEVELS.get(level, LEVELS["error"]) < _threshold:
+		return
+	rate = _sample_rates.get(message)
+	if rate is not None and random.random() >= rate:
+		return
 	entry = {
-		"ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-		"level": level.lower(),
+		"ts": _timestamp(),
+		"level": level,
 		"msg": message,
 	}
+	if rate is not None:
+		entry["sample_rate"] = rate
 	if context:
 		entry.update(context)
-	sys.stdout.write(json.dumps(entry, ensure_ascii=False) + "\n")
-	sys.stdout.flush()
+	# Serialize now, so later mutation of context values cannot change the line
+	line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+	if LOG_ASYNC:
+		_ensure_writer()
+		backlog = len(_pending)
+		if backlog < LOG_QUEUE_SIZE:
+			_pending.append(line)
+			if backlog >= _high_water:
+				_wake.set()
+			return
+	# Synchronous (or backlog full): anything still queued goes out first
+	for done in _drain(line):
+		done.set()
+
+
+def flush(timeout: float = 5.0):
+	"""Block until every line logged so far is written (or `timeout` passes)."""
+	if _writer_pid != os.getpid():
+		return
+	done = threading.Event()
+	_pending.append(done)
+	_wake.set()
+	done.wait(timeout)
+
+
+atexit.register(flush)
+
+
+def enabled(level: str) -> bool:
+	"""True if entries at `level` would be written; guards expensive context."""
+	return LEVELS.get(level.lower(), LEVELS["error"]) >= _threshold
+
+
+def debug(message: str, **context):
+	log("debug", message, **context)
 
 
 def info(message: str, **context):
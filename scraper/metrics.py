@@ -0,0 +1,205 @@
+"""In-process counters and latency histograms in Prometheus text format.
+
+	with metrics.timed("parse", file_path=path):
+		...
+	metrics.inc("http_cache_hits_total")
+
+Each `timed` span is observed in the `mospi_stage_seconds` histogram under
+its stage label (plus `mospi_stage_errors_total` if it raised); spans slower
+than METRICS_SLOW_SPAN_SECONDS are also logged as `slow_span` with their
+context. Process-pool workers return their samples with `drain()` and the
+parent adds them with `merge()`. `start_exporters()` serves /metrics on
+METRICS_PORT and/or rewrites METRICS_TEXTFILE (node_exporter textfile
+collector) every METRICS_EXPORT_SECONDS.
+"""
+import os, time, atexit, bisect, threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import logging as log
+from .config import METRICS_PORT, METRICS_TEXTFILE, METRICS_EXPORT_SECONDS, METRICS_SLOW_SPAN_SECONDS
+
+PREFIX = "mospi_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+HELP = {
+	"stage_seconds": "Duration of instrumented spans, by stage.",
+	"stage_errors_total": "Instrumented spans that raised, by stage.",
+	"http_requests_total": "HTTP responses received, by status code.",
+	"http_cache_hits_total": "Conditional GETs answered 304 and served from the local cache.",
+	"download_bytes_total": "PDF bytes written to disk.",
+	"embedding_cache_hits_total": "Texts whose vector came from the embedding cache.",
+	"embedding_cache_misses_total": "Texts sent to the embedding model.",
+	"answer_cache_hits_total": "Questions answered from the answer cache.",
+	"answer_cache_misses_total": "Questions that went to retrieval and the LLM.",
+}
+
+
+def _escape(value) -> str:
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple, extra: str = "") -> str:
+	parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+	"""Thread-safe store of counters and fixed-bucket histograms."""
+
+	def __init__(self, buckets: tuple = BUCKETS):
+		self.buckets = buckets
+		self._lock = threading.Lock()
+		self._counters = {}  # (name, labels) -> value
+		self._histograms = {}  # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+
+	def inc(self, name: str, value: float = 1, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		with self._lock:
+			self._counters[key] = self._counters.get(key, 0) + value
+
+	def observe(self, name: str, value: float, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		# Non-cumulative per-bucket counts; render() accumulates them
+		slot = bisect.bisect_left(self.buckets, value)
+		with self._lock:
+			h = self._histograms.get(key)
+			if h is None:
+				h = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+			h[slot] += 1
+			h[-1] += value
+
+	def drain(self) -> dict:
+		"""Return all samples recorded since the last drain and reset them."""
+		with self._lock:
+			state = {"counters": self._counters, "histograms": self._histograms}
+			self._counters, self._histograms = {}, {}
+		return state
+
+	def merge(self, state: dict):
+		"""Add samples from `drain()` (e.g. returned by a worker process)."""
+		with self._lock:
+			for key, value in state.get("counters", {}).items():
+				self._counters[key] = self._counters.get(key, 0) + value
+			for key, counts in state.get("histograms", {}).items():
+				h = self._histograms.get(key)
+				if h is None:
+					self._histograms[key] = list(counts)
+				else:
+					self._histograms[key] = [a + b for a, b in zip(h, counts)]
+
+	def render(self) -> str:
+		with self._lock:
+			counters = sorted(self._counters.items())
+			histograms = sorted((k, list(v)) for k, v in self._histograms.items())
+		lines, declared = [], set()
+
+		def declare(name, kind):
+			if name not in declared:
+				declared.add(name)
+				if name in HELP:
+					lines.append(f"# HELP {PREFIX}{name} {HELP[name]}")
+				lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+		for (name, labels), value in counters:
+			declare(name, "counter")
+			lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+		for (name, labels), h in histograms:
+			declare(name, "histogram")
+			cumulative = 0
+			for bound, n in zip(self.buckets, h):
+				cumulative += n
+				le = f'le="{bound}"'
+				lines.append(f"{PREFIX}{name}_bucket{_labels(labels, le)} {cumulative}")
+			count = cumulative + h[len(self.buckets)]
+			inf = 'le="+Inf"'
+			lines.append(f"{PREFIX}{name}_bucket{_labels(labels, inf)} {count}")
+			lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {h[-1]}")
+			lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+		return "\n".join(lines) + "\n"
+
+
+registry = Metrics()
+inc = registry.inc
+observe = registry.observe
+drain = registry.drain
+merge = registry.merge
+render = registry.render
+
+
+@contextmanager
+def timed(stage: str, slow_seconds: float = None, **context):
+	"""Time the block as `stage`. `context` only goes into the slow-span log."""
+	start = time.perf_counter()
+	try:
+		yield
+	except Exception:
+		inc("stage_errors_total", stage=stage)
+		raise
+	finally:
+		elapsed = time.perf_counter() - start
+		observe("stage_seconds", elapsed, stage=stage)
+		threshold = METRICS_SLOW_SPAN_SECONDS if slow_seconds is None else slow_seconds
+		if threshold and elapsed >= threshold:
+			log.warn("slow_span", stage=stage, seconds=round(elapsed, 3), **context)
+
+
+def write_textfile(path: str = None):
+	path = path or METRICS_TEXTFILE
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	# Atomic swap so a scraper never reads a half-written file
+	tmp_path = f"{path}.{os.getpid()}.tmp"
+	with open(tmp_path, "w", encoding="utf-8") as f:
+		f.write(render())
+	os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+			self.send_error(404)
+			return
+		body = render().encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def _textfile_loop():
+	while True:
+		time.sleep(METRICS_EXPORT_SECONDS)
+		try:
+			write_textfile()
+		except Exception as e:
+			log.error("metrics_textfile_failed", path=METRICS_TEXTFILE, error=str(e))
+
+
+def start_exporters(port: int = None):
+	"""Start the configured exporters once per process (no-op when none are set)."""
+	global _exporters_started
+	port = METRICS_PORT if port is None else port
+	with _exporters_lock:
+		if _exporters_started:
+			return
+		_exporters_started = True
+	if port:
+		try:
+			server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+			server.daemon_threads = True
+			threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+			log.info("metrics_server_started", port=port)
+		except OSError as e:
+			log.error("metrics_server_failed", port=port, error=str(e))
+	if METRICS_TEXTFILE:
+		threading.Thread(target=_textfile_loop, name="metrics-textfile", daemon=True).start()
+		atexit.register(write_textfile)
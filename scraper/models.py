@@ -1,12 +1,67 @@
-import os, re, hashlib, sqlite3, json
-from datetime import datetime
+import os, re, hashlib, sqlite3, json, threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from . import tables
 
 DB_PATH = "data/mospi.db"
 os.makedirs("data", exist_ok=True)
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+_conn = None
+_conn_pid = None
+_conn_lock = threading.RLock()
+# Table files (scraper.tables) written / superseded inside the open
+# transaction: removed on rollback / after commit, so files follow the rows
+_written_files = []
+_replaced_files = []
+
+def get_conn() -> sqlite3.Connection:
+    """Process-wide connection in WAL mode, so readers (e.g. the DB viewer)
+    never block on the pipeline's writes. Callers must hold `_conn_lock`;
+    use `transaction()` rather than calling this directly.
+    """
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only fsyncs at checkpoints and is still corruption-safe
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _conn, _conn_pid = conn, os.getpid()
+    return _conn
+
+@contextmanager
+def transaction():
+    """Unit of work on the shared connection: everything executed inside
+    commits together, or rolls back if the block raises. Nested calls join
+    the outermost transaction. Table files registered in `_written_files`
+    and `_replaced_files` are cleaned up to match the outcome.
+    """
+    with _conn_lock:
+        conn = get_conn()
+        if conn.in_transaction:
+            yield conn.cursor()
+            return
+        del _written_files[:], _replaced_files[:]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn.cursor()
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            tables.remove_files(_written_files)
+            raise
+        # A rewritten file may reuse a superseded path; keep it
+        tables.remove_files(set(_replaced_files) - set(_written_files))
+
+@contextmanager
+def _cursor():
+    with _conn_lock:
+        yield get_conn().cursor()
+
+def _migrate_base_schema(cur):
+    # v1: the schema that init_db used to re-check on every start. Columns are
+    # still probed here because databases from before versioning may lack them.
     # Documents table (new)
     cur.execute(
         """
@@ -45,6 +100,8 @@ def init_db():
         cur.execute("ALTER TABLE files ADD COLUMN file_type TEXT")
     if "pages" not in cols:
         cur.execute("ALTER TABLE files ADD COLUMN pages INTEGER")
+    if "duplicate_of" not in cols:
+        cur.execute("ALTER TABLE files ADD COLUMN duplicate_of INTEGER")
 
     # Tables table (extracted tables from PDFs)
     cur.execute(
@@ -60,135 +117,431 @@ def init_db():
         )
         """
     )
+    cur.execute("PRAGMA table_info(tables)")
+    cols = {row[1] for row in cur.fetchall()}
+    if "page_number" not in cols:
+        cur.execute("ALTER TABLE tables ADD COLUMN page_number INTEGER")
 
-    conn.commit()
-    conn.close()
+def _migrate_indexes(cur):
+    # v2: access paths for the work queue, dedup lookups and document joins
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_files_unprocessed ON files(id) WHERE processed=0")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_files_document_id ON files(document_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_files_file_hash ON files(file_hash)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tables_document_id ON tables(document_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tables_source_file_id ON tables(source_file_id)")
 
-def upsert_file_url(file_url: str):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+def _migrate_jobs(cur):
+    # v3: background pipeline runs, executed by pipeline.worker
     cur.execute(
-        "INSERT OR IGNORE INTO files (file_url, created_at) VALUES (?, ?)",
-        (file_url, datetime.utcnow().isoformat()),
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params_json TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            pages_listed INTEGER DEFAULT 0,
+            files_total INTEGER DEFAULT 0,
+            files_downloaded INTEGER DEFAULT 0,
+            files_parsed INTEGER DEFAULT 0,
+            files_indexed INTEGER DEFAULT 0,
+            files_failed INTEGER DEFAULT 0,
+            error TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat_at TEXT
+        )
+        """
     )
-    conn.commit()
-    conn.close()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(id) WHERE status='queued'")
+
+def _migrate_table_storage(cur):
+    # v4: table cells move to Parquet files (scraper.tables); table_json is
+    # only kept for rows written before this version
+    cur.execute("PRAGMA table_info(tables)")
+    cols = {row[1] for row in cur.fetchall()}
+    for name, kind in (
+        ("table_path", "TEXT"), ("header_json", "TEXT"),
+        ("bbox_x0", "REAL"), ("bbox_top", "REAL"), ("bbox_x1", "REAL"), ("bbox_bottom", "REAL"),
+    ):
+        if name not in cols:
+            cur.execute(f"ALTER TABLE tables ADD COLUMN {name} {kind}")
+
+# Append-only: (version, migration). Never edit a migration once released.
+MIGRATIONS = [
+    (1, _migrate_base_schema),
+    (2, _migrate_indexes),
+    (3, _migrate_jobs),
+    (4, _migrate_table_storage),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+_schema_ready = False
+
+def _current_schema_version(cur) -> int:
+    try:
+        cur.execute("SELECT MAX(version) FROM schema_version")
+    except sqlite3.OperationalError:
+        return 0
+    return cur.fetchone()[0] or 0
+
+def init_db():
+    """Bring the database up to SCHEMA_VERSION. Once current, this is a
+    single SELECT (and a no-op for the rest of the process).
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _cursor() as cur:
+        current = _current_schema_version(cur)
+    if current < SCHEMA_VERSION:
+        with transaction() as cur:
+            cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, applied_at TEXT)")
+            # Re-read under the write lock in case another process migrated meanwhile
+            current = _current_schema_version(cur)
+            for version, migrate in MIGRATIONS:
+                if version > current:
+                    migrate(cur)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, applied_at) VALUES (?, ?)",
+                        (version, datetime.utcnow().isoformat()),
+                    )
+    _schema_ready = True
+
+
+def upsert_file_url(file_url: str):
+    with transaction() as cur:
+        cur.execute(
+            "INSERT OR IGNORE INTO files (file_url, created_at) VALUES (?, ?)",
+            (file_url, datetime.utcnow().isoformat()),
+        )
 
 def upsert_document(url: str, title: str = None, date_published: str = None, summary: str = None, category: str = None) -> int:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO documents (title, url, date_published, summary, category, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(url) DO UPDATE SET
-            title=COALESCE(excluded.title, documents.title),
-            date_published=COALESCE(excluded.date_published, documents.date_published),
-            summary=COALESCE(excluded.summary, documents.summary),
-            category=COALESCE(excluded.category, documents.category)
-        """,
-        (title, url, date_published, summary, category, datetime.utcnow().isoformat()),
-    )
-    conn.commit()
-    cur.execute("SELECT id FROM documents WHERE url=?", (url,))
-    doc_id = cur.fetchone()[0]
-    conn.close()
+    with transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO documents (title, url, date_published, summary, category, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                title=COALESCE(excluded.title, documents.title),
+                date_published=COALESCE(excluded.date_published, documents.date_published),
+                summary=COALESCE(excluded.summary, documents.summary),
+                category=COALESCE(excluded.category, documents.category)
+            """,
+            (title, url, date_published, summary, category, datetime.utcnow().isoformat()),
+        )
+        cur.execute("SELECT id FROM documents WHERE url=?", (url,))
+        doc_id = cur.fetchone()[0]
     return doc_id
 
 def upsert_file_for_document(document_id: int, file_url: str) -> int:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT OR IGNORE INTO files (file_url, created_at, document_id) VALUES (?, ?, ?)",
-        (file_url, datetime.utcnow().isoformat(), document_id),
-    )
-    conn.commit()
-    cur.execute("SELECT id FROM files WHERE file_url=?", (file_url,))
-    file_id = cur.fetchone()[0]
-    conn.close()
+    with transaction() as cur:
+        cur.execute(
+            "INSERT OR IGNORE INTO files (file_url, created_at, document_id) VALUES (?, ?, ?)",
+            (file_url, datetime.utcnow().isoformat(), document_id),
+        )
+        cur.execute("SELECT id FROM files WHERE file_url=?", (file_url,))
+        file_id = cur.fetchone()[0]
     return file_id
 
-def get_unprocessed(limit=2):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+def _ids_by_key(cur, table: str, key: str, values: list[str]) -> dict[str, int]:
+    # One query regardless of list size: the keys travel as a single JSON parameter
     cur.execute(
-        "SELECT id, file_url, file_path, downloaded, processed FROM files WHERE processed=0 ORDER BY id ASC LIMIT ?",
-        (limit,)
+        f"SELECT {key}, id FROM {table} WHERE {key} IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(dict.fromkeys(values)), ensure_ascii=False),),
     )
-    rows = cur.fetchall()
-    conn.close()
+    return dict(cur.fetchall())
+
+def upsert_documents(docs: list[dict]) -> dict[str, int]:
+    """Batch counterpart of `upsert_document` for the list returned by
+    `scrape_listing_and_details`. Returns {url: document_id}.
+    """
+    now = datetime.utcnow().isoformat()
+    params = [
+        (d.get("title"), d["url"], d.get("date_published"), d.get("summary"), d.get("category"), now)
+        for d in docs if d.get("url")
+    ]
+    if not params:
+        return {}
+    with transaction() as cur:
+        cur.executemany(
+            """
+            INSERT INTO documents (title, url, date_published, summary, category, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                title=COALESCE(excluded.title, documents.title),
+                date_published=COALESCE(excluded.date_published, documents.date_published),
+                summary=COALESCE(excluded.summary, documents.summary),
+                category=COALESCE(excluded.category, documents.category)
+            """,
+            params,
+        )
+        return _ids_by_key(cur, "documents", "url", [p[1] for p in params])
+
+def upsert_files_for_documents(pairs: list[tuple[int, str]]) -> dict[str, int]:
+    """Batch counterpart of `upsert_file_for_document`; `pairs` are
+    (document_id, file_url). Returns {file_url: file_id}.
+    """
+    if not pairs:
+        return {}
+    now = datetime.utcnow().isoformat()
+    with transaction() as cur:
+        cur.executemany(
+            "INSERT OR IGNORE INTO files (file_url, created_at, document_id) VALUES (?, ?, ?)",
+            [(file_url, now, document_id) for document_id, file_url in pairs],
+        )
+        return _ids_by_key(cur, "files", "file_url", [file_url for _, file_url in pairs])
+
+def get_unprocessed(limit=2):
+    """Oldest unprocessed files first; `limit=None` returns the whole backlog."""
+    with _cursor() as cur:
+        cur.execute(
+            "SELECT id, file_url, file_path, downloaded, processed FROM files WHERE processed=0 ORDER BY id ASC LIMIT ?",
+            (-1 if limit is None else limit,)
+        )
+        rows = cur.fetchall()
     return rows
 
 def get_unprocessed_files(limit=10):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, document_id, file_url, file_path, downloaded, processed
-        FROM files
-        WHERE processed=0
-        ORDER BY id ASC
-        LIMIT ?
-        """,
-        (limit,)
-    )
-    rows = cur.fetchall()
-    conn.close()
+    with _cursor() as cur:
+        cur.execute(
+            """
+            SELECT id, document_id, file_url, file_path, downloaded, processed
+            FROM files
+            WHERE processed=0
+            ORDER BY id ASC
+            LIMIT ?
+            """,
+            (limit,)
+        )
+        rows = cur.fetchall()
     return rows
 
 def update_after_download(file_id, file_path, file_hash):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE files SET file_path=?, file_hash=?, downloaded=1 WHERE id=?",
-        (file_path, file_hash, file_id)
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE files SET file_path=?, file_hash=?, downloaded=1 WHERE id=?",
+            (file_path, file_hash, file_id)
+        )
 
 def update_file_path(file_id: int, new_path: str):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE files SET file_path=? WHERE id=?",
-        (new_path, file_id),
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE files SET file_path=? WHERE id=?",
+            (new_path, file_id),
+        )
 
 def set_file_meta(file_id: int, file_type: str = None, pages: int = None):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE files SET file_type=COALESCE(?, file_type), pages=COALESCE(?, pages) WHERE id=?",
-        (file_type, pages, file_id),
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE files SET file_type=COALESCE(?, file_type), pages=COALESCE(?, pages) WHERE id=?",
+            (file_type, pages, file_id),
+        )
 
 def mark_processed(file_id):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE files SET processed=1 WHERE id=?", (file_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute("UPDATE files SET processed=1 WHERE id=?", (file_id,))
+
+def get_document_id_for_file(file_id: int) -> int | None:
+    with _cursor() as cur:
+        cur.execute("SELECT document_id FROM files WHERE id=?", (file_id,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def get_file_hash(file_id: int) -> str | None:
+    with _cursor() as cur:
+        cur.execute("SELECT file_hash FROM files WHERE id=?", (file_id,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def find_processed_by_hash(file_hash: str, exclude_file_id: int = None) -> int | None:
+    """Return the id of an already processed, non-duplicate file with this content hash."""
+    with _cursor() as cur:
+        cur.execute(
+            """
+            SELECT id FROM files
+            WHERE file_hash=? AND processed=1 AND duplicate_of IS NULL AND id<>?
+            ORDER BY id ASC LIMIT 1
+            """,
+            (file_hash, exclude_file_id if exclude_file_id is not None else -1),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
 
-def insert_table(document_id: int, source_file_id: int, table_rows: list[list[str]]):
+def link_duplicate_file(file_id: int, canonical_file_id: int):
+    """Mark `file_id` as a byte-identical copy of `canonical_file_id`.
+    Its text, tables and vectors are those of the canonical file; nothing is copied.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            UPDATE files SET
+                duplicate_of=?,
+                file_type=(SELECT file_type FROM files WHERE id=?),
+                pages=(SELECT pages FROM files WHERE id=?),
+                processed=1
+            WHERE id=?
+            """,
+            (canonical_file_id, canonical_file_id, canonical_file_id, file_id),
+        )
+
+def insert_table(document_id: int, source_file_id: int, table_rows: list[list[str]], page_number: int = None,
+                 bbox: tuple[float, float, float, float] = None):
+    """Record the table and write it to Parquet (first row as header), named
+    and tagged with its new `tables.id`. `bbox` is (x0, top, x1, bottom) on
+    the page, in PDF points.
+    """
     if not table_rows:
         return
     n_rows = len(table_rows)
     n_cols = max((len(r) for r in table_rows), default=0)
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO tables (document_id, source_file_id, table_json, n_rows, n_cols, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (document_id, source_file_id, json.dumps(table_rows, ensure_ascii=False), n_rows, n_cols, datetime.utcnow().isoformat()),
-    )
-    conn.commit()
-    conn.close()
+    header, body = table_rows[0], table_rows[1:]
+    x0, top, x1, bottom = bbox or (None, None, None, None)
+    with transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO tables (document_id, source_file_id, header_json, n_rows, n_cols, page_number,
+                                bbox_x0, bbox_top, bbox_x1, bbox_bottom, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (document_id, source_file_id, json.dumps(header, ensure_ascii=False), n_rows, n_cols, page_number,
+             x0, top, x1, bottom, datetime.utcnow().isoformat()),
+        )
+        table_id = cur.lastrowid
+        path = tables.table_path(source_file_id, page_number, table_id)
+        _written_files.append(path)
+        tables.write_table(path, header, body, table_id)
+        cur.execute("UPDATE tables SET table_path=? WHERE id=?", (path, table_id))
+
+def delete_tables_for_file(source_file_id: int):
+    """Drop a source file's tables before it is re-extracted: the rows now,
+    and every file in its partition (including any orphaned by a crash)
+    once the transaction commits.
+    """
+    with transaction() as cur:
+        cur.execute("DELETE FROM tables WHERE source_file_id=?", (source_file_id,))
+        for directory, _, names in os.walk(tables.file_dir(source_file_id)):
+            _replaced_files.extend(os.path.join(directory, name) for name in names)
+
+def load_table(table_id: int):
+    """Read one stored table as a DataFrame with its header row as column
+    names; the cells are only read from disk here. None if the id is unknown.
+    """
+    with _cursor() as cur:
+        cur.execute("SELECT table_path, table_json FROM tables WHERE id=?", (table_id,))
+        row = cur.fetchone()
+    if row is None:
+        return None
+    path, table_json = row
+    if path:
+        return tables.to_frame(tables.read_table(path))
+    # Written before schema v4 and not converted yet
+    rows = json.loads(table_json or "[]") or [[]]
+    return tables.to_frame(tables.from_rows(rows[0], rows[1:]))
+
+def tables_dataset():
+    """Every Parquet table as one pyarrow dataset (see `scraper.tables.dataset`),
+    wide enough for the widest recorded table."""
+    with _cursor() as cur:
+        cur.execute("SELECT MAX(n_cols) FROM tables WHERE table_path IS NOT NULL")
+        n_cols = cur.fetchone()[0] or 0
+    return tables.dataset(n_cols)
+
+def convert_legacy_tables(batch_size: int = 500) -> int:
+    """Move table_json rows (written before schema v4) to Parquet files and
+    clear their JSON. Returns the number of tables converted."""
+    converted = 0
+    while True:
+        with _cursor() as cur:
+            cur.execute(
+                "SELECT id, source_file_id, page_number, table_json FROM tables "
+                "WHERE table_path IS NULL AND table_json IS NOT NULL LIMIT ?",
+                (batch_size,),
+            )
+            rows = cur.fetchall()
+        if not rows:
+            return converted
+        with transaction() as cur:
+            for table_id, source_file_id, page_number, table_json in rows:
+                table_rows = json.loads(table_json) or [[]]
+                path = tables.table_path(source_file_id, page_number, table_id)
+                _written_files.append(path)
+                tables.write_table(path, table_rows[0], table_rows[1:], table_id)
+                cur.execute(
+                    "UPDATE tables SET table_path=?, header_json=?, table_json=NULL WHERE id=?",
+                    (path, json.dumps(table_rows[0], ensure_ascii=False), table_id),
+                )
+        converted += len(rows)
+
+JOB_COUNTERS = ("pages_listed", "files_total", "files_downloaded", "files_parsed", "files_indexed", "files_failed")
+
+def enqueue_job(kind: str, params: dict = None) -> int:
+    with transaction() as cur:
+        cur.execute(
+            "INSERT INTO jobs (kind, params_json, status, created_at) VALUES (?, ?, 'queued', ?)",
+            (kind, json.dumps(params or {}), datetime.utcnow().isoformat()),
+        )
+        return cur.lastrowid
+
+def claim_next_job() -> tuple[int, str, dict] | None:
+    """Atomically move the oldest queued job to 'running' and return (id, kind, params).
+    BEGIN IMMEDIATE makes this safe with several worker processes.
+    """
+    now = datetime.utcnow().isoformat()
+    with transaction() as cur:
+        cur.execute("SELECT id, kind, params_json FROM jobs WHERE status='queued' ORDER BY id ASC LIMIT 1")
+        row = cur.fetchone()
+        if row is None:
+            return None
+        # A requeued job starts over, so its counters must too
+        resets = ", ".join(f"{c}=0" for c in JOB_COUNTERS)
+        cur.execute(
+            f"UPDATE jobs SET status='running', started_at=?, heartbeat_at=?, error=NULL, {resets} WHERE id=?",
+            (now, now, row[0]),
+        )
+    return row[0], row[1], json.loads(row[2] or "{}")
+
+def increment_job_counters(job_id: int, **counters: int):
+    """Add to a job's progress counters (names from JOB_COUNTERS) and refresh its heartbeat."""
+    unknown = set(counters) - set(JOB_COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown job counters: {sorted(unknown)}")
+    sets = "".join(f", {name}={name}+?" for name in counters)
+    with transaction() as cur:
+        cur.execute(
+            f"UPDATE jobs SET heartbeat_at=?{sets} WHERE id=?",
+            (datetime.utcnow().isoformat(), *counters.values(), job_id),
+        )
+
+def finish_job(job_id: int, status: str, error: str = None):
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE jobs SET status=?, error=?, finished_at=? WHERE id=?",
+            (status, error, datetime.utcnow().isoformat(), job_id),
+        )
+
+def requeue_stale_jobs(stale_seconds: float) -> int:
+    """Put 'running' jobs whose worker stopped heartbeating back in the queue."""
+    cutoff = (datetime.utcnow() - timedelta(seconds=stale_seconds)).isoformat()
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE jobs SET status='queued', error='worker lost; requeued' WHERE status='running' AND heartbeat_at<?",
+            (cutoff,),
+        )
+        return cur.rowcount
+
+def get_job(job_id: int) -> dict | None:
+    with _cursor() as cur:
+        cur.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
+        row = cur.fetchone()
+        cols = [c[0] for c in cur.description]
+    return dict(zip(cols, row)) if row else None
+
+def list_jobs(limit: int = 10) -> list[dict]:
+    with _cursor() as cur:
+        cur.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        rows = cur.fetchall()
+        cols = [c[0] for c in cur.description]
+    return [dict(zip(cols, row)) for row in rows]
 
 def sanitize_filename(name: str, max_len: int = 120) -> str:
     name = re.sub(r"[^\w\-.() ]+", "_", name)
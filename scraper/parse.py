@@ -1,48 +1,215 @@
+import os
 import pdfplumber
-import streamlit as st
-from typing import List
+from . import logging as log
+from . import metrics
+from .config import OCR_MIN_CHARS, OCR_DPI, OCR_LANG, OCR_WORKERS
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
 
-def extract_text_from_pdf(file_path: str, ocr: bool = False) -> str:
-    text_parts = []
+
+@dataclass
+class ExtractedTable:
+    page_number: int  # 1-based
+    rows: List[List[str]]  # first row is taken as the header
+    bbox: Optional[Tuple[float, float, float, float]] = None  # (x0, top, x1, bottom) in PDF points
+
+
+@dataclass
+class PdfExtraction:
+    pages: List[str] = field(default_factory=list)  # text per page, "" for pages without text
+    page_count: Optional[int] = None
+    tables: List[ExtractedTable] = field(default_factory=list)
+    text_path: Optional[str] = None  # set by extract_pdf_to_file; the text is there, not in `pages`
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(t for t in self.pages if t)
+
+
+def _normalize_rows(raw_rows) -> List[List[str]]:
+    return [[(c if c is not None else "").strip() for c in r] for r in raw_rows]
+
+
+def _ocr_page(file_path: str, page_number: int) -> str:
+    from pdf2image import convert_from_path
+    import pytesseract
+    with metrics.timed("ocr_page", file_path=file_path, page=page_number):
+        # Rasterize just this page, so at most OCR_WORKERS images exist at a time
+        images = convert_from_path(file_path, dpi=OCR_DPI, first_page=page_number, last_page=page_number, grayscale=True)
+        try:
+            return "\n".join(pytesseract.image_to_string(img, lang=OCR_LANG) for img in images)
+        finally:
+            for img in images:
+                img.close()
+
+
+@dataclass
+class PdfPage:
+    number: int  # 1-based
+    text: str  # "" for pages without text
+    tables: List[ExtractedTable] = field(default_factory=list)
+
+
+def _plumber_pages(file_path: str, ocr: bool, tables: bool) -> Iterator[PdfPage]:
+    yielded = 0
     try:
         with pdfplumber.open(file_path) as pdf:
             for page in pdf.pages:
-                txt = page.extract_text() or ""
-                if txt:
-                    text_parts.append(txt)
+                with metrics.timed("pdf_page_text", file_path=file_path, page=page.page_number):
+                    text = page.extract_text() or ""
+                found = []
+                if tables:
+                    try:
+                        with metrics.timed("pdf_page_tables", file_path=file_path, page=page.page_number):
+                            raw_tables = [(t.extract(), t.bbox) for t in page.find_tables()]
+                        found = [
+                            ExtractedTable(page.page_number, _normalize_rows(rows), tuple(bbox))
+                            for rows, bbox in raw_tables if rows
+                        ]
+                    except Exception as e:
+                        log.error("table_extract_failed", file_path=file_path, page=page.page_number, error=str(e))
+                # Drop the page's parsed objects and cached text map; otherwise
+                # every page stays alive until the document is closed
+                page.close()
+                yielded += 1
+                yield PdfPage(page.page_number, text, found)
+    except Exception as e:
+        log.error("pdf_read_failed", file_path=file_path, error=str(e))
+    if ocr and not yielded:
+        # pdfplumber could not read the file; try OCR on everything pdftoppm can render
+        try:
+            from pdf2image import pdfinfo_from_path
+            page_count = int(pdfinfo_from_path(file_path)["Pages"])
+        except Exception as e:
+            log.error("ocr_failed", file_path=file_path, error=str(e))
+            return
+        for n in range(1, page_count + 1):
+            yield PdfPage(n, "")
+
+
+def _apply_ocr(file_path: str, page: PdfPage, future) -> PdfPage:
+    try:
+        text = future.result()
     except Exception as e:
-        st.error(f"Failed to read {file_path} → {e}")
+        log.error("ocr_failed", file_path=file_path, page=page.number, error=str(e))
+        return page
+    if len(text.strip()) > len(page.text.strip()):
+        page.text = text
+    return page
 
-    text = "\n\n".join(text_parts)
 
-    if ocr and not text.strip():
+def iter_pdf_pages(file_path: str, ocr: bool = False, tables: bool = True, workers: int = OCR_WORKERS) -> Iterator[PdfPage]:
+    """Yield the PDF's pages in order, one at a time, releasing each page's
+    pdfplumber objects once it is extracted, so memory does not grow with
+    the page count.
+
+    With `ocr`, pages whose text layer has fewer than OCR_MIN_CHARS
+    characters (scanned pages, also inside otherwise born-digital files) are
+    OCR'd, `workers` at a time, while later pages are being read; the OCR
+    text replaces the page text when it is longer. pdftoppm and tesseract run
+    as child processes, so threads are enough to keep several cores busy.
+    """
+    if not ocr:
+        with metrics.timed("parse", file_path=file_path):
+            yield from _plumber_pages(file_path, ocr, tables)
+        return
+
+    if workers > 1:
+        # Parallelism comes from pages; stop each tesseract from also spawning a thread per core
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    workers = max(1, workers)
+    # Pages wait here, in order, until their OCR is done; bounded so a slow
+    # OCR page cannot make the rest of the document pile up behind it
+    window = deque()
+    max_window = workers * 4
+    in_flight = ocr_count = 0
+    with metrics.timed("parse", file_path=file_path), ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") as pool:
         try:
-            from pdf2image import convert_from_path
-            import pytesseract
-            images = convert_from_path(file_path, dpi=300)
-            text = "\n".join(pytesseract.image_to_string(img) for img in images)
-        except Exception as e:
-            st.error(f"OCR failed for {file_path}: {e}")
-    return text
+            for page in _plumber_pages(file_path, ocr, tables):
+                future = None
+                if len(page.text.strip()) < OCR_MIN_CHARS:
+                    future = pool.submit(_ocr_page, file_path, page.number)
+                    in_flight += 1
+                    ocr_count += 1
+                window.append((page, future))
+                while window:
+                    head, future = window[0]
+                    if future is not None and not future.done() and in_flight <= workers and len(window) <= max_window:
+                        break
+                    window.popleft()
+                    if future is not None:
+                        in_flight -= 1
+                        head = _apply_ocr(file_path, head, future)
+                    yield head
+            while window:
+                head, future = window.popleft()
+                yield _apply_ocr(file_path, head, future) if future is not None else head
+        finally:
+            # Stop queued OCR if the consumer gave up early
+            for _, future in window:
+                if future is not None:
+                    future.cancel()
+    if ocr_count:
+        log.info("ocr_pages", file_path=file_path, pages=ocr_count)
+
+
+def extract_pdf(file_path: str, ocr: bool = False, tables: bool = True) -> PdfExtraction:
+    """Collect `iter_pdf_pages` into one PdfExtraction: per-page text, the
+    page count and (optionally) every table with its page number. Holds the
+    whole document's text; `extract_pdf_to_file` does not.
+    """
+    result = PdfExtraction()
+    for page in iter_pdf_pages(file_path, ocr=ocr, tables=tables):
+        result.pages.append(page.text)
+        result.tables.extend(page.tables)
+    result.page_count = len(result.pages) or None
+    return result
+
+
+def extract_pdf_to_file(file_path: str, txt_path: str, ocr: bool = False, tables: bool = True) -> PdfExtraction:
+    """Stream the PDF's text into `txt_path` page by page (same layout as
+    `PdfExtraction.text`) and return the page count and tables, with
+    `text_path` set and no page text kept in memory. The file is replaced
+    atomically, so a failed run never leaves a truncated .txt behind.
+    """
+    result = PdfExtraction(text_path=txt_path)
+    os.makedirs(os.path.dirname(txt_path) or ".", exist_ok=True)
+    tmp_path = f"{txt_path}.{os.getpid()}.tmp"
+    page_count, wrote = 0, False
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for page in iter_pdf_pages(file_path, ocr=ocr, tables=tables):
+                page_count += 1
+                result.tables.extend(page.tables)
+                if page.text:
+                    if wrote:
+                        f.write("\n\n")
+                    f.write(page.text)
+                    wrote = True
+        os.replace(tmp_path, txt_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    result.page_count = page_count or None
+    return result
+
+
+def iter_text_file(path: str, block_size: int = 1 << 16) -> Iterator[str]:
+    """Read a text file in `block_size`-character pieces (for the chunker)."""
+    with open(path, encoding="utf-8") as f:
+        yield from iter(lambda: f.read(block_size), "")
+
+
+def extract_text_from_pdf(file_path: str, ocr: bool = False) -> str:
+    return extract_pdf(file_path, ocr=ocr, tables=False).text
 
 
 def extract_first_table(file_path: str) -> list[list[str]]:
     """Extract the first table found using pdfplumber; returns rows of strings.
     Falls back to empty list if none found.
     """
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables() or []
-                if not tables:
-                    continue
-                # Take the first table
-                raw_rows = tables[0]
-                # Normalize cells to strings
-                rows: List[List[str]] = []
-                for r in raw_rows:
-                    rows.append([(c if c is not None else "").strip() for c in r])
-                return rows
-    except Exception as e:
-        st.error(f"Table extract failed for {file_path}: {e}")
-    return []
+    extraction = extract_pdf(file_path)
+    return extraction.tables[0].rows if extraction.tables else []
@@ -0,0 +1,136 @@
+"""Extracted tables stored as Parquet, one file per table.
+
+Files are laid out as hive partitions under data/tables:
+
+    source_file_id=<id>/page_number=<n>/table_<table_id>.parquet
+
+so `dataset()` scans every table at once, with the file and page as
+columns and without touching SQLite or parsing JSON. Cells are strings
+in positional columns c0..cN; each file also stores its `tables.id` as a
+`table_id` column, so scanned rows can be grouped by table and joined
+back to their `tables` row. The header row (the first extracted row)
+is kept apart, in the `tables` row and the file's schema metadata, because
+PDF headers are often blank, repeated or multi-line.
+
+Usage:
+    python -m scraper.tables --convert   # move legacy table_json rows to Parquet
+"""
+import os, json, argparse
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+TABLES_DIR = os.path.join("data", "tables")
+_HEADER_KEY = b"mospi.header"
+_ID_COLUMN = "table_id"
+_PARTITIONING = ds.partitioning(pa.schema([("source_file_id", pa.int64()), ("page_number", pa.int64())]), flavor="hive")
+
+
+def column_names(n_cols: int) -> list[str]:
+    return [f"c{i}" for i in range(n_cols)]
+
+
+def file_dir(source_file_id: int) -> str:
+    """The partition holding every table of one source file."""
+    return os.path.join(TABLES_DIR, f"source_file_id={source_file_id}")
+
+
+def table_path(source_file_id: int, page_number: int, table_id: int) -> str:
+    return os.path.join(file_dir(source_file_id), f"page_number={page_number or 0}", f"table_{table_id}.parquet")
+
+
+def from_rows(header: list[str], rows: list[list[str]], table_id: int = None) -> pa.Table:
+    n_cols = max([len(header)] + [len(r) for r in rows])
+    # Ragged rows are padded so every column has one cell per row
+    columns = [pa.array([r[i] if i < len(r) else "" for r in rows], pa.string()) for i in range(n_cols)]
+    schema = pa.schema([(name, pa.string()) for name in column_names(n_cols)])
+    if table_id is not None:
+        columns.append(pa.array([table_id] * len(rows), pa.int64()))
+        schema = schema.append(pa.field(_ID_COLUMN, pa.int64()))
+    schema = schema.with_metadata({_HEADER_KEY: json.dumps(header, ensure_ascii=False).encode("utf-8")})
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_table(path: str, header: list[str], rows: list[list[str]], table_id: int):
+    table = from_rows(header, rows, table_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Atomic swap so a reader never sees a half-written file; the dot prefix
+    # keeps dataset() from picking up the temporary file
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_files([tmp_path])
+        raise
+
+
+def remove_files(paths):
+    """Delete table files (missing ones are fine) and the partition
+    directories they leave empty."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        directory = os.path.dirname(path)
+        # page_number=<n>, then source_file_id=<id>; rmdir fails once one is not empty
+        for _ in range(2):
+            if os.path.normpath(directory) == os.path.normpath(TABLES_DIR):
+                break
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+
+def read_table(path: str, columns: list[str] = None) -> pa.Table:
+    return pq.read_table(path, columns=columns)
+
+
+def header_of(table: pa.Table) -> list[str]:
+    raw = (table.schema.metadata or {}).get(_HEADER_KEY)
+    return json.loads(raw) if raw else []
+
+
+def to_frame(table: pa.Table):
+    """DataFrame with the header row as column names (blank and repeated
+    names are made unique)."""
+    header = header_of(table)
+    if _ID_COLUMN in table.column_names:
+        table = table.drop_columns([_ID_COLUMN])
+    df = table.to_pandas()
+    names, seen = [], {}
+    for i, position_name in enumerate(df.columns):
+        name = (header[i] if i < len(header) else "").strip() or position_name
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    df.columns = names
+    return df
+
+
+def dataset(n_cols: int) -> ds.Dataset:
+    """All stored tables as one dataset with columns c0..c{n_cols-1} (missing
+    cells are null), table_id, source_file_id and page_number."""
+    schema = pa.schema([(name, pa.string()) for name in column_names(n_cols)] + [(_ID_COLUMN, pa.int64())])
+    schema = pa.unify_schemas([schema, _PARTITIONING.schema])
+    os.makedirs(TABLES_DIR, exist_ok=True)
+    return ds.dataset(TABLES_DIR, format="parquet", partitioning=_PARTITIONING, schema=schema)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Maintain the Parquet table store.")
+    ap.add_argument("--convert", action="store_true", help="write legacy table_json rows as Parquet and clear their JSON")
+    args = ap.parse_args()
+    if not args.convert:
+        ap.print_help()
+        return
+    from .models import init_db, convert_legacy_tables
+    init_db()
+    print(f"converted {convert_legacy_tables()} tables")
+
+
+if __name__ == "__main__":
+    main()